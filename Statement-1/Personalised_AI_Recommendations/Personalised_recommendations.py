@@ -11,11 +11,19 @@ Scoring: Weighted diagonal consensus to derive top 5 personalized movie suggesti
 """
 
 import datetime
-import random
+import hashlib
+import itertools
+import os
+import time
 import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from dataclasses import dataclass
-from typing import List, Tuple, Dict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from catalog_file import CatalogFile, write_catalog
+from retrieval_index import IVFIndex
 
 # --- Enhanced Enumerations for Multi-Modal Analysis ---
 class TimeBlock(Enum):
@@ -67,12 +75,274 @@ class Movie:
     popularity_score: float                   # Overall popularity (1-10)
     group_suitability: float                  # Group viewing suitability (1-10)
 
+# --- Compact Columnar Catalog ---
+# Movie compatibility fields in modality order, with their attribute keys
+COMPATIBILITY_FIELDS = ['time_compatibility', 'behavior_compatibility', 'voice_compatibility', 'facial_compatibility']
+MODALITY_ATTRIBUTES = [
+    [tb.value for tb in TimeBlock],
+    [bp.value for bp in BehaviorPattern],
+    [va.value for va in VoiceAttribute],
+    [fa.value for fa in FacialAttribute]
+]
+
+class MovieRecord:
+    """
+    Slotted read-only view of one CompactCatalog row with the same attributes as Movie;
+    compatibility dicts are materialized only when accessed
+    """
+    __slots__ = ('catalog', 'row')
+    
+    def __init__(self, catalog: "CompactCatalog", row: int):
+        self.catalog = catalog
+        self.row = row
+    
+    def __eq__(self, other) -> bool:
+        return isinstance(other, MovieRecord) and other.catalog is self.catalog and other.row == self.row
+    
+    def __hash__(self) -> int:
+        return hash((id(self.catalog), self.row))
+    
+    def __repr__(self) -> str:
+        return f"MovieRecord(title={self.title!r}, year={self.year}, genre={self.genre!r})"
+    
+    @property
+    def title(self) -> str:
+        return self.catalog.title_at(self.row)
+    
+    @property
+    def year(self) -> int:
+        return int(self.catalog.years[self.row])
+    
+    @property
+    def genre(self) -> str:
+        return self.catalog.genres[self.catalog.genre_codes[self.row]]
+    
+    def _compatibility(self, modality: int) -> Dict[str, float]:
+        # Round on every path: float32 storage turns 8.3 into 8.300000190734863
+        values = np.round(self.catalog.compatibility[self.row, modality].astype(np.float64) * self.catalog.scale, 3)
+        return dict(zip(MODALITY_ATTRIBUTES[modality], values.tolist()))
+    
+    @property
+    def time_compatibility(self) -> Dict[str, float]:
+        return self._compatibility(0)
+    
+    @property
+    def behavior_compatibility(self) -> Dict[str, float]:
+        return self._compatibility(1)
+    
+    @property
+    def voice_compatibility(self) -> Dict[str, float]:
+        return self._compatibility(2)
+    
+    @property
+    def facial_compatibility(self) -> Dict[str, float]:
+        return self._compatibility(3)
+    
+    @property
+    def popularity_score(self) -> float:
+        return float(self.catalog.popularity[self.row])
+    
+    @property
+    def group_suitability(self) -> float:
+        return float(self.catalog.suitability[self.row])
+
+class CompactCatalog(Sequence):
+    """
+    Structure-of-arrays movie catalog: titles in one UTF-8 string table, genres interned
+    as uint16 codes, all compatibility scores in a single float32 N×4×6 array
+    (modality × attribute) and plain numeric columns
+
+    Indexing returns MovieRecord views, so code written against Movie keeps working.
+    Catalogs opened from a catalog file are memory-mapped and copied into memory
+    only when modified
+    """
+    
+    def __init__(self, capacity: int = 16):
+        self.count = 0
+        self.scale = 1.0  # original score = stored compatibility × scale
+        self.title_blob = bytearray()
+        self.title_offsets = np.zeros(capacity + 1, dtype=np.int64)
+        self.years = np.zeros(capacity, dtype=np.int16)
+        self.genres: List[str] = []
+        self.genre_lookup: Dict[str, int] = {}
+        self.genre_codes = np.zeros(capacity, dtype=np.uint16)
+        self.compatibility = np.zeros((capacity, 4, 6), dtype=np.float32)
+        self.popularity = np.zeros(capacity)
+        self.suitability = np.zeros(capacity)
+    
+    @classmethod
+    def from_movies(cls, movies: Iterable[Movie]) -> "CompactCatalog":
+        catalog = cls()
+        for movie in movies:
+            catalog.append(movie)
+        catalog.trim()
+        return catalog
+    
+    @classmethod
+    def from_file(cls, path: str) -> "CompactCatalog":
+        """
+        Memory-map a catalog file written by save()
+        """
+        source = CatalogFile(path)
+        if source.shape != (4, 6):
+            raise ValueError(f"{path} holds {source.shape} blocks, expected 4×6")
+        
+        catalog = cls(capacity=0)
+        catalog.count = len(source)
+        catalog.scale = source.scale
+        catalog.title_blob = source.title_blob
+        catalog.title_offsets = source.title_offsets
+        catalog.years = source.years
+        catalog.genres = list(source.genres)
+        catalog.genre_lookup = {genre: code for code, genre in enumerate(catalog.genres)}
+        catalog.genre_codes = source.genre_codes
+        catalog.compatibility = source.compatibility
+        catalog.popularity = source.popularity
+        catalog.suitability = source.suitability
+        return catalog
+    
+    def save(self, path: str):
+        """
+        Write the catalog as a memory-mappable catalog file (atomic replace), storing
+        compatibility on the engine's 0-1 scoring scale
+        """
+        count = self.count
+        compatibility = np.round(self.compatibility[:count].astype(np.float64) * (self.scale / 10.0), 3)
+        write_catalog(path, list(self.titles()), self.years[:count], self.genre_codes[:count], self.genres,
+                      compatibility, self.popularity[:count], self.suitability[:count], scale=10.0)
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [MovieRecord(self, i) for i in range(*row.indices(self.count))]
+        if row < 0:
+            row += self.count
+        if not 0 <= row < self.count:
+            raise IndexError("catalog row out of range")
+        return MovieRecord(self, row)
+    
+    def __iter__(self) -> Iterator[MovieRecord]:
+        return (MovieRecord(self, row) for row in range(self.count))
+    
+    def title_at(self, row: int) -> str:
+        return bytes(self.title_blob[self.title_offsets[row]:self.title_offsets[row + 1]]).decode('utf-8')
+    
+    def titles(self) -> Iterator[str]:
+        return (self.title_at(row) for row in range(self.count))
+    
+    def _ensure_writable(self):
+        """
+        Copy memory-mapped columns into memory before the first modification
+        """
+        if not isinstance(self.title_blob, bytearray):
+            self.title_blob = bytearray(bytes(self.title_blob))
+        for name in ('title_offsets', 'years', 'genre_codes', 'compatibility', 'popularity', 'suitability'):
+            column = getattr(self, name)
+            if not column.flags.writeable:
+                setattr(self, name, np.array(column))
+    
+    def _grow(self, capacity: int):
+        self.title_offsets = np.resize(self.title_offsets, capacity + 1)
+        for name in ('years', 'genre_codes', 'popularity', 'suitability'):
+            setattr(self, name, np.resize(getattr(self, name), capacity))
+        compatibility = np.zeros((capacity, 4, 6), dtype=np.float32)
+        compatibility[:self.count] = self.compatibility[:self.count]
+        self.compatibility = compatibility
+    
+    def trim(self):
+        """
+        Release unused capacity after bulk loading
+        """
+        self._grow(self.count)
+    
+    def _genre_code(self, genre: str) -> int:
+        code = self.genre_lookup.get(genre)
+        if code is None:
+            code = self.genre_lookup[genre] = len(self.genres)
+            self.genres.append(genre)
+        return code
+    
+    def _write_row(self, row: int, movie: Movie):
+        self.years[row] = movie.year
+        self.genre_codes[row] = self._genre_code(movie.genre)
+        for modality, (field_name, attributes) in enumerate(zip(COMPATIBILITY_FIELDS, MODALITY_ATTRIBUTES)):
+            scores = getattr(movie, field_name)
+            values = np.array([scores[attr] for attr in attributes], dtype=np.float64)
+            if self.scale != 1.0:
+                values = np.round(values / self.scale, 3)
+            self.compatibility[row, modality] = values
+        self.popularity[row] = movie.popularity_score
+        self.suitability[row] = movie.group_suitability
+    
+    def append(self, movie: Movie):
+        self._ensure_writable()
+        if self.count == len(self.years):
+            self._grow(max(16, 2 * self.count))
+        row = self.count
+        self.title_blob += movie.title.encode('utf-8')
+        self.title_offsets[row + 1] = len(self.title_blob)
+        self._write_row(row, movie)
+        self.count += 1
+    
+    def __setitem__(self, row: int, movie: Movie):
+        """
+        Replace a row in place; the title must stay the same
+        """
+        if movie.title != self.title_at(row):
+            raise ValueError("replacing a catalog row cannot change its title")
+        self._ensure_writable()
+        self._write_row(row, movie)
+
+# --- Consensus Explanations ---
+MODALITY_NAMES = ['time', 'behavior', 'voice', 'facial']
+CONSENSUS_THRESHOLDS = np.array([0.4, 0.6, 0.8])
+CONSENSUS_STRENGTHS = ["limited consensus", "moderate consensus", "strong consensus", "exceptional consensus"]
+
+def classify_consensus(consensus_scores: np.ndarray) -> np.ndarray:
+    """
+    Consensus-strength bucket (index into CONSENSUS_STRENGTHS) for a whole score array at once;
+    a score above a threshold moves up a bucket, a score equal to it does not
+    """
+    return np.searchsorted(CONSENSUS_THRESHOLDS, consensus_scores, side='left')
+
+def explain_recommendation(consensus_score: float, diagonal_scores: np.ndarray) -> str:
+    """
+    Human-readable explanation from the consensus strength and strongest modality
+    """
+    strength = CONSENSUS_STRENGTHS[int(classify_consensus(consensus_score))]
+    strongest_modality = MODALITY_NAMES[int(np.argmax(diagonal_scores))]
+    return f"User {strength} with high {strongest_modality} alignment across all modalities"
+
+class LazyExplanation:
+    """
+    Descriptor behind UserRecommendation.explanation: a given text is kept, None is
+    replaced by a generated explanation on first access
+    """
+    
+    def __set_name__(self, owner, name):
+        self.slot = "_" + name
+    
+    def __get__(self, recommendation, owner=None) -> str:
+        if recommendation is None:
+            # Class access is how dataclasses look for a default: there is none
+            raise AttributeError(self.slot[1:])
+        text = recommendation.__dict__.get(self.slot)
+        if text is None:
+            text = recommendation.__dict__[self.slot] = explain_recommendation(
+                recommendation.consensus_score, recommendation.diagonal_scores)
+        return text
+    
+    def __set__(self, recommendation, text: Optional[str]):
+        recommendation.__dict__[self.slot] = text
+
 @dataclass
 class UserRecommendation:
-    """Enhanced recommendation with matrix analysis"""
+    """Enhanced recommendation with matrix analysis; explanation=None generates it on first access"""
     movie: Movie
     consensus_score: float
-    explanation: str
+    explanation: str = LazyExplanation()
     compatibility_matrix: np.ndarray          # 6×4 movie-specific matrix
     diagonal_scores: np.ndarray               # 4×1 diagonal alignment scores
 
@@ -138,14 +408,296 @@ ENHANCED_MOVIES: List[Movie] = [
           popularity_score=8.6, group_suitability=7.0)
 ]
 
+# --- Seedable User Simulation ---
+# Dirichlet concentrations for each modality row of the simulated 4×6 user matrix
+USER_PREFERENCE_ALPHAS = np.array([
+    [2, 3, 4, 5, 3, 2],  # Time: evening bias
+    [3, 2, 4, 2, 2, 3],  # Behavior: binge bias
+    [3, 2, 3, 4, 3, 2],  # Voice: balanced
+    [3, 3, 2, 3, 3, 2]   # Facial: engagement focus
+])
+
+RNGLike = Union[None, int, np.random.SeedSequence, np.random.Generator]
+
+def resolve_rng(rng: RNGLike = None):
+    """
+    Generator for a seed, SeedSequence or Generator; None keeps the legacy global np.random state
+    """
+    if rng is None:
+        return np.random
+    return np.random.default_rng(rng)
+
+def simulate_user_matrices(count: int, rng: RNGLike = None) -> np.ndarray:
+    """
+    Draw count simulated 4×6 user matrices at once (one vectorized dirichlet per modality row)
+    """
+    rng = resolve_rng(rng)
+    user_matrices = np.empty((count, 4, 6))
+    for row, alphas in enumerate(USER_PREFERENCE_ALPHAS):
+        user_matrices[:, row, :] = rng.dirichlet(alphas, size=count)
+    return np.round(user_matrices, 3)
+
+def simulate_user_matrices_parallel(count: int, seed: Optional[int] = None, chunk_size: int = 262144,
+                                    workers: Optional[int] = None) -> np.ndarray:
+    """
+    Simulate many user matrices across a thread pool
+
+    Every chunk draws from its own child of SeedSequence(seed), so the output
+    depends only on seed and chunk_size, never on the number of workers
+    """
+    starts = range(0, count, chunk_size)
+    children = np.random.SeedSequence(seed).spawn(len(starts))
+    user_matrices = np.empty((count, 4, 6))
+    
+    def fill(chunk: int):
+        start = starts[chunk]
+        stop = min(start + chunk_size, count)
+        user_matrices[start:stop] = simulate_user_matrices(stop - start, children[chunk])
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(fill, range(len(starts))))
+    return user_matrices
+
+# --- Top-k Selection ---
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores in descending order
+
+    Uses an O(N) partial selection instead of a full sort; ties at the cut-off
+    keep catalog order, exactly like a stable descending sort
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    
+    kth_score = np.partition(scores, len(scores) - k)[len(scores) - k]
+    above = np.flatnonzero(scores > kth_score)
+    ties = np.flatnonzero(scores == kth_score)[:k - len(above)]
+    winners = np.concatenate([above, ties])
+    
+    # Only the k winners are sorted (stable so equal scores stay in catalog order)
+    return winners[np.argsort(-scores[winners], kind='stable')]
+
+# --- Compiled Catalog Store ---
+# Catalog versions are unique across stores, so swapping in a new catalog invalidates caches
+_catalog_versions = itertools.count(1)
+
+class CatalogStore:
+    """
+    Compiled catalog: every movie's 6×4 compatibility matrix packed into one
+    float32 N×6×4 array with a (title, year) → row index, so remakes sharing a
+    title keep their own rows
+
+    Rows are compiled once at load time; only rows of movies that change are
+    recompiled, and every change bumps the catalog version
+    """
+    
+    def __init__(self, movies: Iterable[Movie], build_matrix: Callable[[Movie], np.ndarray]):
+        self.build_matrix = build_matrix
+        self.version = next(_catalog_versions)
+        self._item_vectors: Optional[np.ndarray] = None
+        self._item_vectors_version = -1
+        self._index: Optional[Dict[Tuple[str, int], int]] = None
+        
+        if isinstance(movies, CompactCatalog):
+            # Columnar catalogs compile as whole arrays, no per-movie dict walks
+            self.movies = movies
+            count = len(movies)
+            if movies.scale == 10.0:
+                # Already on the 0-1 scoring scale (e.g. memory-mapped from a catalog file): no copy
+                compiled = movies.compatibility[:count]
+            else:
+                compiled = np.round(movies.compatibility[:count] * (movies.scale / 10.0), 3).astype(np.float32)
+            self.matrices = compiled.transpose(0, 2, 1)
+            self.popularity = movies.popularity[:count] / 10.0
+            self.suitability = movies.suitability[:count] / 10.0
+            return
+        
+        self.movies: List[Movie] = list(movies)
+        
+        count = len(self.movies)
+        self.matrices = np.zeros((count, 6, 4), dtype=np.float32)
+        self.popularity = np.zeros(count)
+        self.suitability = np.zeros(count)
+        for row in range(count):
+            self._compile_row(row)
+        self.index  # reject duplicate movies at load time
+    
+    def __len__(self) -> int:
+        return len(self.movies)
+    
+    @staticmethod
+    def key(movie: Movie) -> Tuple[str, int]:
+        return movie.title, movie.year
+    
+    @property
+    def index(self) -> Dict[Tuple[str, int], int]:
+        """
+        (title, year) → row index; raises ValueError if two movies share both. Movie
+        lists are indexed at load time, compact catalogs on first use so memory-mapped
+        catalogs open instantly
+        """
+        if self._index is None:
+            if isinstance(self.movies, CompactCatalog):
+                keys = zip(self.movies.titles(), self.movies.years[:len(self.movies)].tolist())
+            else:
+                keys = (self.key(movie) for movie in self.movies)
+            index: Dict[Tuple[str, int], int] = {}
+            for row, key in enumerate(keys):
+                if index.setdefault(key, row) != row:
+                    raise ValueError(f"Catalog rows {index[key]} and {row} are both {key[0]!r} ({key[1]})")
+            self._index = index
+        return self._index
+    
+    def _compile_row(self, row: int):
+        movie = self.movies[row]
+        self.matrices[row] = self.build_matrix(movie)
+        self.popularity[row] = movie.popularity_score / 10.0
+        self.suitability[row] = movie.group_suitability / 10.0
+    
+    def matrix_for(self, movie: Movie) -> np.ndarray:
+        """
+        Compiled 6×4 matrix for a movie; movies outside the store are compiled on the fly
+        """
+        row = self.index.get(self.key(movie))
+        if row is None or (self.movies[row] is not movie and self.movies[row] != movie):
+            return self.build_matrix(movie).astype(np.float32)
+        return self.matrices[row]
+    
+    @property
+    def item_vectors(self) -> np.ndarray:
+        """
+        N×24 modality-major flattening of the catalog (entry m*6+a holds movie[a, m]),
+        rebuilt lazily whenever the catalog version changes
+        """
+        if self._item_vectors_version != self.version:
+            count = len(self.movies)
+            self._item_vectors = np.ascontiguousarray(self.matrices.transpose(0, 2, 1).reshape(count, 24))
+            self._item_vectors_version = self.version
+        return self._item_vectors
+    
+    def upsert(self, movie: Movie):
+        """
+        Replace the movie with the same title and year (recompiling only its row) or append a new one
+        """
+        row = self.index.get(self.key(movie))
+        if row is None:
+            row = len(self.movies)
+            self.movies.append(movie)
+            self.index[self.key(movie)] = row
+            self.matrices = np.concatenate([self.matrices, np.zeros((1, 6, 4), dtype=np.float32)])
+            self.popularity = np.append(self.popularity, 0.0)
+            self.suitability = np.append(self.suitability, 0.0)
+        else:
+            self.movies[row] = movie
+            self._ensure_writable()
+        self._compile_row(row)
+        self.version = next(_catalog_versions)
+    
+    def invalidate(self, keys: Iterable[Tuple[str, int]]):
+        """
+        Recompile the rows of movies, given as (title, year), whose attributes were modified in place
+        """
+        self._ensure_writable()
+        for key in keys:
+            self._compile_row(self.index[key])
+        self.version = next(_catalog_versions)
+    
+    def _ensure_writable(self):
+        if not self.matrices.flags.writeable:
+            self.matrices = np.array(self.matrices)
+
+# --- Recommendation Result Cache ---
+class RecommendationCache:
+    """
+    LRU cache with TTL for recommendation lists, keyed on a quantized hash of the user matrix
+
+    Entries are only valid for one context (catalog version and modality weights);
+    validate() drops everything as soon as the context changes
+    """
+    
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 300.0, decimals: int = 3,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.decimals = decimals
+        self.clock = clock
+        self.entries: "OrderedDict[bytes, Tuple[float, List[UserRecommendation]]]" = OrderedDict()
+        self.context: Optional[Tuple] = None
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def make_key(self, user_matrix: np.ndarray, request: Tuple = ()) -> bytes:
+        """
+        Hash of the user matrix rounded to the cache precision plus per-request options
+        """
+        quantized = np.rint(np.asarray(user_matrix, dtype=np.float64) * 10 ** self.decimals).astype(np.int64)
+        digest = hashlib.blake2b(quantized.tobytes(), digest_size=16)
+        digest.update(repr(request).encode())
+        return digest.digest()
+    
+    def validate(self, context: Tuple):
+        """
+        Invalidate every entry when the catalog version or modality weights changed
+        """
+        if context != self.context:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.context = context
+    
+    def get(self, key: bytes) -> Optional[List[UserRecommendation]]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            del self.entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+    
+    def put(self, key: bytes, value: List[UserRecommendation]):
+        self.entries[key] = (self.clock() + self.ttl_seconds, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+    
+    def clear(self):
+        self.entries.clear()
+    
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations
+        }
+
 class EnhancedRecommendationEngine:
     """
     Advanced recommendation engine with matrix multiplication-based scoring
     """
     
     def __init__(self, movies: List[Movie]):
-        self.movies = movies
-        
         # Weighted importance of each modality for consensus scoring
         self.modality_weights = {
             'time': 0.30,      # Time block preferences have high impact
@@ -159,32 +711,63 @@ class EnhancedRecommendationEngine:
         self.behavior_attributes = [bp.value for bp in BehaviorPattern]
         self.voice_attributes = [va.value for va in VoiceAttribute]
         self.facial_attributes = [fa.value for fa in FacialAttribute]
+        
+        # Catalog compiled once into a stacked N×6×4 array for scoring
+        self.catalog = CatalogStore(movies, self.build_movie_compatibility_matrix)
+        
+        # Optional approximate retrieval index, rebuilt when the catalog version changes
+        self.retrieval_index: Optional[IVFIndex] = None
+        self.retrieval_index_version = -1
+        
+        # Optional result cache in front of generate_recommendations
+        self.result_cache: Optional[RecommendationCache] = None
+    
+    @classmethod
+    def from_catalog_file(cls, path: str) -> "EnhancedRecommendationEngine":
+        """
+        Create an engine over a memory-mapped catalog file
+        """
+        return cls(CompactCatalog.from_file(path))
+    
+    @property
+    def movies(self) -> List[Movie]:
+        return self.catalog.movies
+    
+    def reload_catalog(self, path: str):
+        """
+        Hot-swap the catalog from a catalog file; the new catalog version invalidates
+        the result cache and the retrieval index
+        """
+        self.catalog = CatalogStore(CompactCatalog.from_file(path), self.build_movie_compatibility_matrix)
+    
+    def save_catalog_file(self, path: str):
+        """
+        Write the current catalog as a memory-mappable catalog file
+        """
+        catalog = self.movies if isinstance(self.movies, CompactCatalog) else CompactCatalog.from_movies(self.movies)
+        catalog.save(path)
+    
+    def enable_result_cache(self, max_size: int = 10000, ttl_seconds: float = 300.0) -> RecommendationCache:
+        """
+        Put an LRU/TTL result cache in front of generate_recommendations
+        """
+        self.result_cache = RecommendationCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        return self.result_cache
+    
+    def update_movie(self, movie: Movie):
+        """
+        Add or replace a catalog movie (matched on title and year), recompiling only its row
+        """
+        self.catalog.upsert(movie)
     
-    def generate_user_input_matrix(self) -> np.ndarray:
+    def generate_user_input_matrix(self, rng: RNGLike = None) -> np.ndarray:
         """
         Generate a realistic 4×6 user input matrix representing user preferences
         across time, behavior, voice, and facial analysis modalities
+
+        Pass a numpy Generator or seed for reproducible, thread-independent draws
         """
-        # Simulate user preferences with realistic distributions
-        user_matrix = np.zeros((4, 6))
-        
-        # Time preferences (Row 0): User's time block preferences
-        time_prefs = np.random.dirichlet([2, 3, 4, 5, 3, 2])  # Evening bias
-        user_matrix[0, :] = time_prefs
-        
-        # Behavior preferences (Row 1): User's interaction patterns
-        behavior_prefs = np.random.dirichlet([3, 2, 4, 2, 2, 3])  # Binge bias
-        user_matrix[1, :] = behavior_prefs
-        
-        # Voice analysis (Row 2): Alexa-detected preferences
-        voice_prefs = np.random.dirichlet([3, 2, 3, 4, 3, 2])  # Balanced
-        user_matrix[2, :] = voice_prefs
-        
-        # Facial analysis (Row 3): Computer vision preferences
-        facial_prefs = np.random.dirichlet([3, 3, 2, 3, 3, 2])  # Engagement focus
-        user_matrix[3, :] = facial_prefs
-        
-        return np.round(user_matrix, 3)
+        return simulate_user_matrices(1, rng)[0]
     
     def build_movie_compatibility_matrix(self, movie: Movie) -> np.ndarray:
         """
@@ -210,12 +793,23 @@ class EnhancedRecommendationEngine:
         
         return np.round(matrix, 3)
     
+    def modality_weight_vector(self) -> np.ndarray:
+        """
+        Modality weights as a vector in time, behavior, voice, facial order
+        """
+        return np.array([
+            self.modality_weights['time'],
+            self.modality_weights['behavior'],
+            self.modality_weights['voice'],
+            self.modality_weights['facial']
+        ])
+    
     def calculate_consensus_score(self, user_matrix: np.ndarray, movie: Movie) -> Tuple[float, np.ndarray, np.ndarray]:
         """
         Calculate consensus score using matrix multiplication and diagonal extraction
         """
-        # Build movie compatibility matrix
-        movie_matrix = self.build_movie_compatibility_matrix(movie)
+        # Look up the precompiled movie compatibility matrix
+        movie_matrix = self.catalog.matrix_for(movie)
         
         # Matrix multiplication: (4×6) × (6×4) = (4×4)
         result_matrix = np.dot(user_matrix, movie_matrix)
@@ -224,12 +818,7 @@ class EnhancedRecommendationEngine:
         diagonal_scores = np.diag(result_matrix)
         
         # Apply modality weights to diagonal scores
-        weights = np.array([
-            self.modality_weights['time'],
-            self.modality_weights['behavior'], 
-            self.modality_weights['voice'],
-            self.modality_weights['facial']
-        ])
+        weights = self.modality_weight_vector()
         
         # Calculate weighted consensus score
         raw_consensus = np.dot(diagonal_scores, weights)
@@ -243,53 +832,209 @@ class EnhancedRecommendationEngine:
         
         return final_consensus, diagonal_scores, movie_matrix
     
-    def generate_explanation(self, consensus_score: float, diagonal_scores: np.ndarray) -> str:
+    def score_catalog(self, user_matrix: np.ndarray, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Generate human-readable explanation for recommendation
+        Score the whole catalog (or only the given catalog rows) in one vectorized pass
+
+        Returns consensus scores and the matching ×4 diagonal scores, identical to
+        calling calculate_consensus_score movie by movie
         """
-        # Determine consensus strength
-        if consensus_score > 0.8:
-            strength = "exceptional consensus"
-        elif consensus_score > 0.6:
-            strength = "strong consensus"
-        elif consensus_score > 0.4:
-            strength = "moderate consensus"
-        else:
-            strength = "limited consensus"
+        matrices, popularity, suitability = self.catalog.matrices, self.catalog.popularity, self.catalog.suitability
+        if rows is not None:
+            matrices, popularity, suitability = matrices[rows], popularity[rows], suitability[rows]
         
-        # Identify strongest alignment modality
-        modality_names = ['time', 'behavior', 'voice', 'facial']
-        strongest_idx = np.argmax(diagonal_scores)
-        strongest_modality = modality_names[strongest_idx]
+        # Only the diagonal of (4×6) × (6×4) is needed: diag[n, m] = Σ_a user[m, a] · movie[n, a, m]
+        diagonal_scores = np.einsum('ma,nam->nm', user_matrix, matrices)
         
-        # Generate explanation
-        explanation = f"User {strength} with high {strongest_modality} alignment across all modalities"
+        # Weighted consensus blended with popularity and group suitability
+        raw_consensus = diagonal_scores @ self.modality_weight_vector()
+        final_consensus = (0.8 * raw_consensus + 0.2 * popularity + 0.0 * suitability)
         
-        return explanation
+        return final_consensus, diagonal_scores
+    
+    def user_query_vectors(self, user_matrices: np.ndarray) -> np.ndarray:
+        """
+        Fold modality weights and the 0.8 consensus factor into U×24 query vectors,
+        so that query · item_vector + 0.2 · popularity is the consensus score
+        """
+        user_matrices = np.asarray(user_matrices, dtype=np.float64).reshape(-1, 4, 6)
+        weighted = user_matrices * (0.8 * self.modality_weight_vector())[np.newaxis, :, np.newaxis]
+        return weighted.reshape(len(user_matrices), 24)
     
-    def generate_recommendations(self, user_matrix: np.ndarray) -> List[UserRecommendation]:
+    def build_retrieval_index(self, n_lists: Optional[int] = None, seed: int = 0) -> IVFIndex:
         """
-        Generate top 5 movie recommendations using matrix-based analysis
+        Build the IVF retrieval index over the compiled catalog
+
+        Item vectors carry the popularity blend as a 25th component, so a user's
+        query (with a trailing 1) scores exactly like the consensus score
+        """
+        bias = 0.2 * self.catalog.popularity + 0.0 * self.catalog.suitability
+        vectors = np.hstack([self.catalog.item_vectors, bias[:, np.newaxis]])
+        self.retrieval_index = IVFIndex(vectors, n_lists=n_lists, seed=seed)
+        self.retrieval_index_version = self.catalog.version
+        return self.retrieval_index
+    
+    def retrieve_candidates(self, user_matrix: np.ndarray, n_candidates: int = 300, n_probe: int = 8) -> np.ndarray:
         """
+        Fetch candidate catalog rows for a user from the retrieval index (best first)
+        """
+        if self.retrieval_index is None or self.retrieval_index_version != self.catalog.version:
+            self.build_retrieval_index()
+        query = np.append(self.user_query_vectors(user_matrix)[0], 1.0)
+        return self.retrieval_index.search(query, n_candidates, n_probe)
+    
+    def retrieval_recall(self, user_matrices: np.ndarray, k: int = 5,
+                         n_candidates: int = 300, n_probe: int = 8) -> Dict[str, float]:
+        """
+        Recall@k of index retrieval plus exact rescoring against the brute-force path,
+        with mean per-user latency of both paths in milliseconds
+        """
+        if self.retrieval_index is None or self.retrieval_index_version != self.catalog.version:
+            self.build_retrieval_index()
+        
+        hits, total = 0, 0
+        exact_time = approx_time = 0.0
+        for user_matrix in np.asarray(user_matrices).reshape(-1, 4, 6):
+            start = time.perf_counter()
+            exact_scores, _ = self.score_catalog(user_matrix)
+            exact = top_k_indices(exact_scores, k)
+            exact_time += time.perf_counter() - start
+            
+            start = time.perf_counter()
+            candidates = self.retrieve_candidates(user_matrix, n_candidates, n_probe)
+            candidate_scores, _ = self.score_catalog(user_matrix, candidates)
+            approx = candidates[top_k_indices(candidate_scores, k)]
+            approx_time += time.perf_counter() - start
+            
+            hits += len(np.intersect1d(exact, approx))
+            total += len(exact)
+        
+        users = max(1, len(user_matrices))
+        return {
+            'recall_at_k': hits / total if total else 1.0,
+            'exact_ms_per_user': 1000.0 * exact_time / users,
+            'index_ms_per_user': 1000.0 * approx_time / users
+        }
+    
+    def recommend_batch(self, user_matrices: np.ndarray, k: int = 5,
+                        memory_budget: int = 256 * 1024 * 1024,
+                        workers: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score U users (U×4×6) against the whole catalog and keep each user's top k
+
+        Users are processed in chunks whose U×N scores and argpartition indices fit
+        what the memory budget leaves after the float64 copy of the catalog vectors
+        (shared across workers); chunks run on a thread pool since the matrix product
+        and partial selection release the GIL. Returns U×k catalog row indices (int32)
+        and consensus scores (float32), best first. Ties at the cut-off are not
+        ordered by catalog position as in generate_recommendations
+        """
+        queries = self.user_query_vectors(user_matrices)
+        # Cast once here: a float32 catalog would otherwise be upcast inside every chunk's product
+        catalog_items = self.catalog.item_vectors
+        items = catalog_items.astype(queries.dtype, copy=False)
+        bias = (0.2 * self.catalog.popularity + 0.0 * self.catalog.suitability).astype(queries.dtype, copy=False)
+        user_count, catalog_size = len(queries), len(items)
+        k = min(k, catalog_size)
+        
+        indices = np.zeros((user_count, k), dtype=np.int32)
+        scores = np.zeros((user_count, k), dtype=np.float32)
+        if user_count == 0 or k == 0:
+            return indices, scores
+        
+        # Per user row a chunk holds its N scores and the N indices argpartition returns
+        workers = workers or os.cpu_count() or 1
+        row_bytes = catalog_size * (queries.itemsize + np.dtype(np.intp).itemsize)
+        chunk_budget = memory_budget - (items.nbytes if items is not catalog_items else 0)
+        chunk_size = max(1, chunk_budget // (workers * row_bytes))
+        
+        def score_chunk(start: int):
+            stop = min(start + chunk_size, user_count)
+            chunk_scores = queries[start:stop] @ items.T
+            chunk_scores += bias
+            
+            # Partial selection per user (the k largest end up last), then order only the k winners
+            top = np.argpartition(chunk_scores, catalog_size - k, axis=1)[:, catalog_size - k:]
+            top_scores = np.take_along_axis(chunk_scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind='stable')
+            indices[start:stop] = np.take_along_axis(top, order, axis=1)
+            scores[start:stop] = np.take_along_axis(top_scores, order, axis=1)
+        
+        starts = range(0, user_count, chunk_size)
+        if workers == 1 or len(starts) == 1:
+            for start in starts:
+                score_chunk(start)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(score_chunk, starts))
+        
+        return indices, scores
+    
+    def generate_explanation(self, consensus_score: float, diagonal_scores: np.ndarray) -> str:
+        """
+        Generate human-readable explanation for recommendation
+        """
+        return explain_recommendation(consensus_score, diagonal_scores)
+    
+    def generate_recommendations(self, user_matrix: np.ndarray, k: int = 5, batched: bool = True,
+                                 use_index: bool = False) -> List[UserRecommendation]:
+        """
+        Generate top k movie recommendations using matrix-based analysis
+
+        The batched mode scores the whole catalog as a flat array, picks the top k
+        with a partial selection and only then builds UserRecommendation objects
+        for the winners (explanations are generated lazily on access); use_index first narrows the
+        catalog to candidates from the retrieval index and exact-rescores those.
+        batched=False keeps the original per-movie loop. With the result cache
+        enabled, near-identical user matrices reuse a previous result
+        """
+        if self.result_cache is None:
+            return self._generate_recommendations(user_matrix, k, batched, use_index)
+        
+        # Catalog or weight changes invalidate the whole cache
+        self.result_cache.validate((self.catalog.version, tuple(self.modality_weight_vector())))
+        key = self.result_cache.make_key(user_matrix, (k, batched, use_index))
+        recommendations = self.result_cache.get(key)
+        if recommendations is None:
+            recommendations = self._generate_recommendations(user_matrix, k, batched, use_index)
+            self.result_cache.put(key, recommendations)
+        return list(recommendations)
+    
+    def _generate_recommendations(self, user_matrix: np.ndarray, k: int, batched: bool,
+                                  use_index: bool) -> List[UserRecommendation]:
+        if batched:
+            rows = self.retrieve_candidates(user_matrix) if use_index else None
+            consensus_scores, diagonal_scores = self.score_catalog(user_matrix, rows)
+            recommendations = []
+            for i in top_k_indices(consensus_scores, k):
+                row = i if rows is None else rows[i]
+                recommendations.append(UserRecommendation(
+                    movie=self.movies[row],
+                    consensus_score=float(consensus_scores[i]),
+                    explanation=None,
+                    compatibility_matrix=self.catalog.matrices[row],
+                    diagonal_scores=diagonal_scores[i]
+                ))
+            return recommendations
+        
         recommendations = []
         
         for movie in self.movies:
             consensus_score, diagonal_scores, movie_matrix = self.calculate_consensus_score(user_matrix, movie)
-            explanation = self.generate_explanation(consensus_score, diagonal_scores)
             
             recommendation = UserRecommendation(
                 movie=movie,
                 consensus_score=consensus_score,
-                explanation=explanation,
+                explanation=None,
                 compatibility_matrix=movie_matrix,
                 diagonal_scores=diagonal_scores
             )
             
             recommendations.append(recommendation)
         
-        # Sort by consensus score and return top 5
+        # Sort by consensus score and return top k
         recommendations.sort(key=lambda x: x.consensus_score, reverse=True)
-        return recommendations[:5]
+        return recommendations[:k]
     
     def display_recommendations(self, user_matrix: np.ndarray):
         """
@@ -350,7 +1095,7 @@ class EnhancedRecommendationEngine:
         print("Matrix-based scoring provides enhanced accuracy through multi-modal alignment")
         print("Diagonal extraction ensures specific modality matching for precise recommendations")
 
-def main():
+def main(seed: Optional[int] = 42):
     """
     Main execution function for Fire TV Enhanced Recommendation System
     """
@@ -361,13 +1106,10 @@ def main():
     engine = EnhancedRecommendationEngine(ENHANCED_MOVIES)
     
     # Generate user input matrix (simulated from multi-modal analysis)
-    user_matrix = engine.generate_user_input_matrix()
+    user_matrix = engine.generate_user_input_matrix(np.random.default_rng(seed))
     
     # Display comprehensive recommendations
     engine.display_recommendations(user_matrix)
 
 if __name__ == "__main__":
-    # Set random seed for reproducible results
-    random.seed(42)
-    np.random.seed(42)
     main()
\ No newline at end of file
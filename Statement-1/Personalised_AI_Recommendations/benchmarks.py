@@ -0,0 +1,291 @@
+"""
+Benchmarks for the Fire TV Personalised Recommendation modules
+
+Run as:
+    python benchmarks.py <command> [size]
+
+Commands:
+    recall    – recall@k and latency of the IVF retrieval index vs brute force
+    simulate  – seeded simulated user matrices per second
+    memory    – bytes per title of Movie dataclasses vs the CompactCatalog
+    history   – incremental HistoryAccumulator vs the batch weighted history matrix
+    refresh   – batch processed user matrices per second for ragged watch histories
+    recovery  – HistoryStore restart time: full log replay vs snapshot + log tail
+    window    – bytes per user of history lists vs HistoryAccumulator at windows 20/1k/10k
+    learner   – feedback events per second absorbed by the WeightLearner
+    scores    – dynamic_ratios per-movie calculate_score loop vs stacked calculate_scores
+    imports   – cold import time of dynamic_ratios and whether it loads matplotlib
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from typing import List
+
+from Personalised_recommendations import (
+    COMPATIBILITY_FIELDS, ENHANCED_MOVIES, MODALITY_ATTRIBUTES, CompactCatalog,
+    EnhancedRecommendationEngine, Movie, simulate_user_matrices, simulate_user_matrices_parallel
+)
+from dynamic_ratios import (
+    INITIAL_WEIGHTS, WeightLearner, calculate_score, calculate_scores, update_weights, user_emotions
+)
+from history_store import EVENT_DTYPE, HistoryStore
+from preprocessing_with_history import (
+    BASE_COMPAT, HistoryAccumulator, calculate_exponential_decay_weights, generate_movie_history,
+    process_user_matrices, weighted_history_matrix
+)
+
+
+def synthetic_catalog(size: int, seed: int = 0) -> List[Movie]:
+    """Random catalog whose titles vary around the five hand-written movies"""
+    rng = np.random.default_rng(seed)
+    bases = [
+        np.array([[getattr(movie, field)[attr] for attr in attrs]
+                  for field, attrs in zip(COMPATIBILITY_FIELDS, MODALITY_ATTRIBUTES)])
+        for movie in ENHANCED_MOVIES
+    ]
+    noise = rng.integers(-3, 4, size=(size, 4, 6))
+    scores = rng.uniform(5, 10, size=(size, 2)).round(1).tolist()
+
+    movies = []
+    for i in range(size):
+        base = ENHANCED_MOVIES[i % len(ENHANCED_MOVIES)]
+        values = np.clip(bases[i % len(bases)] + noise[i], 1, 10).tolist()
+        compat = [dict(zip(attrs, row)) for attrs, row in zip(MODALITY_ATTRIBUTES, values)]
+        movies.append(Movie(f"{base.title} #{i}", base.year, base.genre, *compat,
+                            popularity_score=scores[i][0], group_suitability=scores[i][1]))
+    return movies
+
+
+def bench_recall(catalog_size: int = 100_000, users: int = 200, k: int = 5):
+    engine = EnhancedRecommendationEngine(synthetic_catalog(catalog_size))
+
+    start = time.perf_counter()
+    engine.build_retrieval_index()
+    print(f"Index build: {time.perf_counter() - start:.2f}s for {catalog_size} titles "
+          f"({engine.retrieval_index.n_lists} lists)")
+
+    user_matrices = simulate_user_matrices(users, rng=42)
+    print(f"{'candidates':>10} | {'probe':>5} | {'recall@k':>8} | {'exact ms':>8} | {'index ms':>8}")
+    print("-" * 52)
+    for n_candidates, n_probe in [(100, 4), (300, 8), (500, 16)]:
+        report = engine.retrieval_recall(user_matrices, k, n_candidates, n_probe)
+        print(f"{n_candidates:10} | {n_probe:5} | {report['recall_at_k']:8.3f} | "
+              f"{report['exact_ms_per_user']:8.3f} | {report['index_ms_per_user']:8.3f}")
+
+
+def bench_simulate(count: int = 2_000_000):
+    for workers in (1, None):
+        start = time.perf_counter()
+        simulate_user_matrices_parallel(count, seed=42, workers=workers)
+        elapsed = time.perf_counter() - start
+        label = "1 worker" if workers == 1 else "all cores"
+        print(f"{label:10}: {count / elapsed:,.0f} user matrices/s ({elapsed:.2f}s for {count})")
+
+
+def bench_memory(catalog_size: int = 100_000):
+    tracemalloc.start()
+
+    start = tracemalloc.get_traced_memory()[0]
+    movies = synthetic_catalog(catalog_size)
+    dataclass_bytes = tracemalloc.get_traced_memory()[0] - start
+    del movies
+
+    start = tracemalloc.get_traced_memory()[0]
+    catalog = CompactCatalog.from_movies(synthetic_catalog(catalog_size))
+    compact_bytes = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+
+    print(f"Titles: {len(catalog)}")
+    print(f"Movie dataclasses : {dataclass_bytes / catalog_size:8.0f} bytes/title")
+    print(f"CompactCatalog    : {compact_bytes / catalog_size:8.0f} bytes/title")
+    print(f"Reduction         : {dataclass_bytes / compact_bytes:8.1f}x")
+
+
+def bench_history(events: int = 20_000, window: int = 20):
+    rng = np.random.default_rng(42)
+    watched = rng.random((events, 6, 4))
+
+    accumulator = HistoryAccumulator(window)
+    history = []
+    max_error = 0.0
+    incremental = batch = 0.0
+    for compat in watched:
+        start = time.perf_counter()
+        accumulator.push(compat)
+        matrix = accumulator.matrix()
+        incremental += time.perf_counter() - start
+
+        start = time.perf_counter()
+        history.insert(0, {"compat": compat})
+        del history[window:]
+        expected = weighted_history_matrix(history, calculate_exponential_decay_weights(len(history)))
+        batch += time.perf_counter() - start
+        max_error = max(max_error, float(np.abs(matrix - expected).max()))
+
+    print(f"Events: {events}, window: {window}")
+    print(f"Batch recompute : {batch / events * 1e6:8.1f} us/event")
+    print(f"Accumulator     : {incremental / events * 1e6:8.1f} us/event")
+    print(f"Max abs error   : {max_error:.2e}")
+
+
+def bench_refresh(users: int = 200_000, max_history: int = 40):
+    rng = np.random.default_rng(42)
+    lengths = rng.integers(0, max_history + 1, size=users)
+    offsets = np.zeros(users + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    compat = rng.random((offsets[-1], 6, 4))
+    user_matrices = simulate_user_matrices(users, rng=rng)
+    print(f"Users: {users}, watch events: {offsets[-1]}")
+
+    sample = 2_000
+    start = time.perf_counter()
+    for u in range(sample):
+        history = [{"compat": c} for c in compat[offsets[u]:offsets[u + 1]]]
+        if history:
+            weighted_history_matrix(history, calculate_exponential_decay_weights(len(history)))
+    elapsed = time.perf_counter() - start
+    print(f"{'per-user loop':14}: {sample / elapsed:12,.0f} users/s")
+
+    for workers in (1, None):
+        start = time.perf_counter()
+        process_user_matrices(user_matrices, compat, offsets, workers=workers)
+        elapsed = time.perf_counter() - start
+        label = "batch 1 worker" if workers == 1 else "batch all cores"
+        print(f"{label:14}: {users / elapsed:12,.0f} users/s")
+
+
+def bench_recovery(users: int = 200_000, events_per_user: int = 10, batch: int = 100_000):
+    rng = np.random.default_rng(42)
+    events = np.zeros(users * events_per_user, dtype=EVENT_DTYPE)
+    events["user"] = rng.integers(0, users, size=len(events))
+    events["time"] = time.time()
+    events["compat"] = rng.random((len(events), 6, 4))
+    tail = len(events) // 100
+
+    directory = tempfile.mkdtemp(prefix="history-store-")
+    try:
+        start = time.perf_counter()
+        with HistoryStore(directory, snapshot_every=len(events) + 1) as store:
+            for offset in range(0, len(events) - tail, batch):
+                store.record_batch(events[offset:min(offset + batch, len(events) - tail)])
+            store.snapshot()
+            store.record_batch(events[len(events) - tail:])
+        elapsed = time.perf_counter() - start
+        print(f"Users: {users}, events: {len(events)} ({len(events) / elapsed:,.0f} events/s recorded)")
+
+        start = time.perf_counter()
+        HistoryStore(directory).close()
+        print(f"Snapshot + {tail} tail events : {time.perf_counter() - start:6.2f}s")
+
+        os.remove(os.path.join(directory, HistoryStore.SNAPSHOT_NAME))
+        start = time.perf_counter()
+        HistoryStore(directory).close()
+        print(f"Full log replay              : {time.perf_counter() - start:6.2f}s")
+    finally:
+        shutil.rmtree(directory)
+
+
+def bench_window(users: int = 20):
+    def bytes_per_user(build):
+        tracemalloc.start()
+        start = tracemalloc.get_traced_memory()[0]
+        kept = [build(u) for u in range(users)]
+        used = tracemalloc.get_traced_memory()[0] - start
+        tracemalloc.stop()
+        del kept
+        return used / users
+
+    print(f"{'window':>7} | {'history list':>14} | {'accumulator':>12} | {'id + delta':>12}")
+    print("-" * 55)
+    for window in (20, 1_000, 10_000):
+        histories = [generate_movie_history(window, u) for u in range(users)]
+        listed = bytes_per_user(lambda u: generate_movie_history(window, u))
+        plain = bytes_per_user(lambda u: HistoryAccumulator.from_history(histories[u], window))
+        compact = bytes_per_user(lambda u: HistoryAccumulator.from_history(histories[u], window, catalog=BASE_COMPAT))
+        print(f"{window:7} | {listed:14,.0f} | {plain:12,.0f} | {compact:12,.0f}")
+
+
+def bench_learner(events: int = 5_000_000, users: int = 1_000_000, batch: int = 100_000):
+    rng = np.random.default_rng(42)
+    user_ids = rng.integers(0, users, size=events)
+    feedback = rng.random((events, 4))
+
+    sample = 50_000
+    table = np.tile(INITIAL_WEIGHTS, (users, 1))
+    start = time.perf_counter()
+    for user, values in zip(user_ids[:sample].tolist(), feedback[:sample]):
+        table[user] = update_weights(table[user], values)
+    print(f"{'per-event loop':14}: {sample / (time.perf_counter() - start):12,.0f} events/s")
+
+    learner = WeightLearner(users)
+    start = time.perf_counter()
+    for offset in range(0, events, batch):
+        learner.update(user_ids[offset:offset + batch], feedback[offset:offset + batch])
+    print(f"{'WeightLearner':14}: {events / (time.perf_counter() - start):12,.0f} events/s "
+          f"({users} users, batches of {batch})")
+
+
+def bench_scores(catalog_size: int = 10_000, repeats: int = 20):
+    rng = np.random.default_rng(42)
+    movie_matrices = rng.random((catalog_size, 4, 6))
+    catalog = {f"Movie {i}": matrix for i, matrix in enumerate(movie_matrices)}
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        looped = {name: calculate_score(matrix, user_emotions, INITIAL_WEIGHTS)[0] for name, matrix in catalog.items()}
+    loop_ms = (time.perf_counter() - start) / repeats * 1e3
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        scores, _ = calculate_scores(movie_matrices, user_emotions, INITIAL_WEIGHTS)
+    fused_ms = (time.perf_counter() - start) / repeats * 1e3
+
+    error = np.abs(scores - np.array(list(looped.values()))).max()
+    print(f"Movies: {catalog_size}")
+    print(f"calculate_score loop : {loop_ms:8.2f} ms")
+    print(f"calculate_scores     : {fused_ms:8.2f} ms ({loop_ms / fused_ms:.0f}x, max abs diff {error:.1e})")
+
+
+def bench_imports(repeats: int = 5):
+    probe = ("import sys, time; start = time.perf_counter(); import {module}; "
+             "print(time.perf_counter() - start, any(m.startswith('matplotlib') for m in sys.modules))")
+
+    def cold_import(module):
+        # A fresh interpreter per run, so nothing is already imported
+        timings = []
+        for _ in range(repeats):
+            output = subprocess.run([sys.executable, "-c", probe.format(module=module)],
+                                    capture_output=True, text=True, check=True).stdout.split()
+            timings.append(float(output[0]))
+        return min(timings) * 1e3, output[1] == "True"
+
+    elapsed, plotting = cold_import("dynamic_ratios")
+    print(f"import dynamic_ratios    : {elapsed:8.1f} ms (matplotlib loaded: {plotting})")
+    try:
+        elapsed, _ = cold_import("matplotlib.pyplot")
+        print(f"import matplotlib.pyplot : {elapsed:8.1f} ms (avoided unless --report)")
+    except subprocess.CalledProcessError:
+        print("import matplotlib.pyplot : not installed")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:] or ["?"]
+    handlers = {
+        "recall":   lambda: bench_recall(*map(int, args[1:2])),
+        "simulate": lambda: bench_simulate(*map(int, args[1:2])),
+        "memory":   lambda: bench_memory(*map(int, args[1:2])),
+        "history":  lambda: bench_history(*map(int, args[1:2])),
+        "refresh":  lambda: bench_refresh(*map(int, args[1:2])),
+        "recovery": lambda: bench_recovery(*map(int, args[1:2])),
+        "window":   lambda: bench_window(*map(int, args[1:2])),
+        "learner":  lambda: bench_learner(*map(int, args[1:2])),
+        "scores":   lambda: bench_scores(*map(int, args[1:2])),
+        "imports":  lambda: bench_imports(*map(int, args[1:2])),
+    }
+    handlers.get(args[0], lambda: print(__doc__))()
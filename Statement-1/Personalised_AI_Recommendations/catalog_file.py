@@ -0,0 +1,141 @@
+"""
+Memory-Mapped Catalog File Format for the Fire TV Recommendation Engines
+
+A catalog file holds every title of a recommendation catalog in one binary file that
+engines open with numpy.memmap: nothing is parsed at load time, pages are read on
+demand and shared read-only across worker processes through the OS page cache.
+
+Layout (little-endian, every section aligned to 64 bytes):
+    header          magic, format version, title count, R×C compatibility block shape,
+                    score scale, genre count
+    section table   (offset, size) for each section below
+    compatibility   float32 N×R×C compatibility blocks
+    years           int16 N
+    genre_codes     uint16 N (index into the genre table)
+    popularity      float64 N
+    suitability     float64 N
+    title_offsets   int64 N+1, title_blob  UTF-8 string table for titles
+    genre_offsets   int64 G+1, genre_blob  UTF-8 string table for genres
+
+Stored compatibility values times `scale` give the original scores. Files are written
+to a temporary name and renamed into place, so a catalog can be hot-swapped atomically
+while readers keep using the previously mapped file.
+"""
+
+import os
+import struct
+import tempfile
+import numpy as np
+from typing import Iterator, List, Sequence
+
+MAGIC = b"FTVCATLG"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+HEADER = struct.Struct("<8sIIIIdI4x")
+SECTIONS = [
+    ("compatibility", np.float32),
+    ("years", np.int16),
+    ("genre_codes", np.uint16),
+    ("popularity", np.float64),
+    ("suitability", np.float64),
+    ("title_offsets", np.int64),
+    ("title_blob", np.uint8),
+    ("genre_offsets", np.int64),
+    ("genre_blob", np.uint8),
+]
+SECTION_ENTRY = struct.Struct("<QQ")
+
+
+def _string_table(strings: Sequence[str]):
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def write_catalog(path: str, titles: Sequence[str], years: np.ndarray, genre_codes: np.ndarray,
+                  genres: Sequence[str], compatibility: np.ndarray, popularity: np.ndarray,
+                  suitability: np.ndarray, scale: float = 1.0):
+    """
+    Write a catalog file atomically (temporary file + rename in the same directory)
+    """
+    compatibility = np.asarray(compatibility, dtype=np.float32)
+    count, rows, cols = compatibility.shape
+    title_offsets, title_blob = _string_table(titles)
+    genre_offsets, genre_blob = _string_table(genres)
+    arrays = {
+        "compatibility": compatibility,
+        "years": years,
+        "genre_codes": genre_codes,
+        "popularity": popularity,
+        "suitability": suitability,
+        "title_offsets": title_offsets,
+        "title_blob": title_blob,
+        "genre_offsets": genre_offsets,
+        "genre_blob": genre_blob,
+    }
+
+    # Lay out sections after the header and section table
+    position = HEADER.size + SECTION_ENTRY.size * len(SECTIONS)
+    table = []
+    for name, dtype in SECTIONS:
+        arrays[name] = np.ascontiguousarray(arrays[name], dtype=dtype)
+        position = -(-position // ALIGNMENT) * ALIGNMENT
+        table.append((position, arrays[name].nbytes))
+        position += arrays[name].nbytes
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".catalog-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, count, rows, cols, scale, len(genres)))
+            for offset, size in table:
+                f.write(SECTION_ENTRY.pack(offset, size))
+            for (name, _), (offset, _) in zip(SECTIONS, table):
+                f.write(b"\0" * (offset - f.tell()))
+                f.write(arrays[name].tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+class CatalogFile:
+    """
+    Read-only, memory-mapped view of a catalog file; every array is a zero-copy view
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.buffer = np.memmap(path, dtype=np.uint8, mode="r")
+
+        header = bytes(self.buffer[:HEADER.size])
+        magic, version, self.count, rows, cols, self.scale, genre_count = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a catalog file")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} uses unsupported catalog format version {version}")
+        self.shape = (rows, cols)
+
+        for index, (name, dtype) in enumerate(SECTIONS):
+            start = HEADER.size + index * SECTION_ENTRY.size
+            offset, size = SECTION_ENTRY.unpack(bytes(self.buffer[start:start + SECTION_ENTRY.size]))
+            setattr(self, name, self.buffer[offset:offset + size].view(dtype))
+        self.compatibility = self.compatibility.reshape(self.count, rows, cols)
+
+        self.genres: List[str] = [
+            bytes(self.genre_blob[self.genre_offsets[i]:self.genre_offsets[i + 1]]).decode("utf-8")
+            for i in range(genre_count)
+        ]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def title_at(self, row: int) -> str:
+        return bytes(self.title_blob[self.title_offsets[row]:self.title_offsets[row + 1]]).decode("utf-8")
+
+    def titles(self) -> Iterator[str]:
+        return (self.title_at(row) for row in range(self.count))
@@ -4,25 +4,245 @@ Features: Face, Voice, Time, Behavior — initialized at 25% each.
 Dynamically updates weights based on user feedback.
 """
 
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
 import numpy as np
-import matplotlib.pyplot as plt
 
 # Feature order: Face, Voice, Time, Behavior
 FEATURE_NAMES = ["Face", "Voice", "Time", "Behavior"]
-weights = np.array([0.25, 0.25, 0.25, 0.25])
-weight_evolution = [weights.copy()]
+INITIAL_WEIGHTS = np.array([0.25, 0.25, 0.25, 0.25])
+weights = INITIAL_WEIGHTS.copy()
 
-def update_weights(old_weights, user_feedback):
-    momentum = 0.6
+def update_weights(old_weights, user_feedback, momentum=0.6):
     new_weights = momentum * old_weights + (1 - momentum) * user_feedback
     return new_weights / np.sum(new_weights)
 
+class WeightLearner:
+    """
+    Feature weights for many users (a U x 4 table), learned online from feedback.
+    Each feedback vector applies the update_weights momentum rule to its user's row.
+    """
+
+    def __init__(self, num_users=0, momentum=0.6):
+        self.momentum = momentum
+        self.table = np.tile(INITIAL_WEIGHTS, (num_users, 1))
+        self.updates = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.table)
+
+    def _ensure_users(self, max_user):
+        if max_user >= len(self.table):
+            size = max(max_user + 1, 2 * len(self.table))
+            grown = np.tile(INITIAL_WEIGHTS, (size, 1))
+            grown[:len(self.table)] = self.table
+            self.table = grown
+
+    def update(self, user_ids, feedback):
+        """
+        Apply a batch of feedback vectors (B x 4) for the given user ids in one call.
+        Several events for the same user are applied in batch order, exactly as
+        repeated update_weights calls would.
+
+        The normaliser of an update only depends on the feedback (the old row sums
+        to 1): with s_k = m + (1 - m) * sum(f_k) each step is w_k = a_k * w_(k-1) + b_k,
+        a_k = m / s_k and b_k = (1 - m) * f_k / s_k. A user's final row is therefore
+        prod(a) * w_0 + sum over k of (product of a after event k) * b_k, computed for
+        all users at once from a cumulative sum of log(a) – no loop over events.
+        """
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        feedback = np.asarray(feedback, dtype=float).reshape(len(user_ids), 4)
+        if len(user_ids) == 0:
+            return
+
+        # Events grouped by user, each user's events in batch order
+        order = np.argsort(user_ids, kind="stable")
+        sorted_ids = user_ids[order]
+        if sorted_ids[0] < 0:
+            raise ValueError(f"User ids must be non-negative, got {sorted_ids[0]}")
+        starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+        ends = np.r_[starts[1:], len(user_ids)] - 1
+        lengths = ends - starts + 1
+        feedback = feedback[order]
+        momentum = self.momentum
+
+        with self.lock:
+            self._ensure_users(int(sorted_ids[-1]))
+            rows = sorted_ids[starts]
+            old = self.table[rows]
+            if momentum == 0:
+                self.table[rows] = feedback[ends] / feedback[ends].sum(axis=1, keepdims=True)
+                self.updates += len(user_ids)
+                return
+
+            totals = momentum + (1 - momentum) * feedback.sum(axis=1)
+            # A stored row that does not sum to 1 is renormalised by its first update
+            totals[starts] += momentum * (old.sum(axis=1) - 1)
+            log_decay = np.log(momentum / totals)
+            cumulative = np.cumsum(log_decay)
+
+            # log of the product of a over the events after each event / over all of a user's events
+            after = np.repeat(cumulative[ends], lengths) - cumulative
+            overall = cumulative[ends] - cumulative[starts] + log_decay[starts]
+            contributions = np.exp(after)[:, np.newaxis] * ((1 - momentum) * feedback / totals[:, np.newaxis])
+            self.table[rows] = np.exp(overall)[:, np.newaxis] * old + np.add.reduceat(contributions, starts)
+            self.updates += len(user_ids)
+
+    def weights_for(self, user_ids):
+        """Copy of the weight rows of the given users (initial weights for unseen users)."""
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        if (user_ids < 0).any():
+            raise ValueError(f"User ids must be non-negative, got {user_ids.min()}")
+        with self.lock:
+            known = user_ids < len(self.table)
+            result = np.tile(INITIAL_WEIGHTS, (len(user_ids), 1))
+            result[known] = self.table[user_ids[known]]
+        return result
+
+    def save(self, path):
+        """Checkpoint the weight table atomically (temporary file + rename)."""
+        with self.lock:
+            table, updates = self.table.copy(), self.updates
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(prefix=".weights-", suffix=".npz", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, table=table, momentum=self.momentum, updates=updates)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """Restore a learner from a checkpoint written by save()."""
+        with np.load(path) as checkpoint:
+            learner = cls(momentum=float(checkpoint["momentum"]))
+            learner.table = checkpoint["table"].copy()
+            learner.updates = int(checkpoint["updates"])
+        return learner
+
+# Binary telemetry record: step, unix time, Face/Voice/Time/Behavior weights
+WEIGHT_RECORD_DTYPE = np.dtype([("step", "<u8"), ("time", "<f8"), ("weights", "<f8", (4,))])
+
+class WeightHistory:
+    """
+    Bounded weight-evolution telemetry.
+    The latest `capacity` weight vectors are kept in a ring buffer (oldest first when
+    iterated). With a sink path every record is also streamed to disk as JSON lines
+    (sink_format="jsonl") or WEIGHT_RECORD_DTYPE records (sink_format="binary"); with
+    downsample=n the sink receives one averaged record per n steps.
+    """
+
+    def __init__(self, capacity=1024, sink=None, sink_format="jsonl", downsample=1):
+        if sink_format not in ("jsonl", "binary"):
+            raise ValueError(f"Unknown sink format: {sink_format}")
+        self.capacity = capacity
+        self.buffer = np.zeros((capacity, 4))
+        self.buffer_steps = np.zeros(capacity, dtype=np.int64)
+        self.start = 0
+        self.size = 0
+        self.step = 0
+
+        self.sink_format = sink_format
+        self.downsample = max(1, downsample)
+        self.pending = np.zeros(4)
+        self.pending_count = 0
+        self.sink = None
+        if sink is not None:
+            self.sink = open(sink, "a" if sink_format == "jsonl" else "ab")
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("weight history index out of range")
+        return self.buffer[(self.start + index) % self.capacity].copy()
+
+    def __iter__(self):
+        return iter(self.array())
+
+    def array(self):
+        """Buffered weight vectors (size x 4), oldest first."""
+        order = (self.start + np.arange(self.size)) % self.capacity
+        return self.buffer[order]
+
+    @property
+    def steps(self):
+        """Step number of every buffered weight vector, oldest first."""
+        return self.buffer_steps[(self.start + np.arange(self.size)) % self.capacity]
+
+    def append(self, new_weights):
+        with self.lock:
+            slot = (self.start + self.size) % self.capacity
+            self.buffer[slot] = new_weights
+            self.buffer_steps[slot] = self.step
+            if self.size < self.capacity:
+                self.size += 1
+            else:
+                self.start = (self.start + 1) % self.capacity
+
+            if self.sink is not None:
+                self.pending += new_weights
+                self.pending_count += 1
+                if self.pending_count == self.downsample:
+                    self._write(self.step, self.pending / self.pending_count)
+            self.step += 1
+
+    def _write(self, step, values):
+        if self.sink_format == "jsonl":
+            record = {"step": step, "time": time.time(),
+                      "weights": dict(zip(FEATURE_NAMES, np.round(values, 6).tolist()))}
+            self.sink.write(json.dumps(record) + "\n")
+        else:
+            record = np.zeros(1, dtype=WEIGHT_RECORD_DTYPE)
+            record["step"], record["time"], record["weights"] = step, time.time(), values
+            self.sink.write(record.tobytes())
+        self.pending[:] = 0
+        self.pending_count = 0
+
+    def flush(self):
+        if self.sink is not None:
+            self.sink.flush()
+
+    def close(self):
+        with self.lock:
+            if self.sink is not None:
+                if self.pending_count:
+                    self._write(self.step - 1, self.pending / self.pending_count)
+                self.sink.close()
+                self.sink = None
+
+weight_evolution = WeightHistory()
+weight_evolution.append(weights)
+
 def calculate_score(movie_matrix, user_emotions, weights):
     product = np.dot(movie_matrix, user_emotions)
     feature_scores = np.diagonal(product)
     final_score = np.dot(feature_scores, weights)
     return final_score, feature_scores
 
+def calculate_scores(movie_matrices, user_emotions, weights):
+    """
+    Scores for a whole stack of movies (M x 4 x 6) in one call.
+    Only the diagonal of each movie_matrix @ user_emotions product is computed,
+    as row-wise dot products, instead of the full 4 x 4 product per movie.
+    Returns (M scores, M x 4 feature scores).
+    """
+    feature_scores = np.einsum('mij,ji->mi', movie_matrices, user_emotions)
+    return feature_scores @ weights, feature_scores
+
 def print_weight_analysis(iteration, prev_weights, new_weights, feedback):
     print(f"\n📊 WEIGHT ANALYSIS — ITERATION {iteration}")
     print("-" * 72)
@@ -60,6 +280,9 @@ movie_feature_matrices = {
     ])
 }
 
+MOVIE_NAMES = list(movie_feature_matrices)
+MOVIE_MATRICES = np.stack(list(movie_feature_matrices.values()))
+
 user_emotions = np.array([
     [0.8, 0.2, 0.5, 0.6],
     [0.3, 0.7, 0.4, 0.9],
@@ -77,7 +300,34 @@ feedback_scenarios = [
     np.array([0.3, 0.4, 0.4, 0.9])
 ]
 
-def main():
+def plot_weight_evolution(weight_evolution, path="weight_evolution.png"):
+    """
+    Save the weight evolution chart to `path`.
+    matplotlib is imported here, with the non-interactive Agg backend, so scoring and
+    weight updates never load the plotting stack.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    evolution_array = np.array(list(weight_evolution))
+    steps = getattr(weight_evolution, "steps", range(len(evolution_array)))
+    fig = plt.figure(figsize=(10, 6))
+    for idx, feature in enumerate(FEATURE_NAMES):
+        plt.plot(evolution_array[:, idx], marker='o', label=feature)
+    plt.title("Feature Weight Evolution")
+    plt.xlabel("Iteration")
+    plt.ylabel("Weight Value")
+    plt.xticks(range(len(evolution_array)), ["Initial" if step == 0 else f"Iter {step}" for step in steps])
+    plt.legend()
+    plt.grid(True)
+    plt.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+    return path
+
+def main(report=None):
+    """Run the feedback iterations; report is a path to save the weight evolution chart to."""
     global weights
     #print("=" * 72)
     #print("🎯 ADAPTIVE MOVIE RECOMMENDATION SYSTEM — FINAL VERSION")
@@ -90,12 +340,11 @@ def main():
         ##print(f"{'Movie':20} | {'Score':>8} | {'Feature Scores'}")
         #print("-" * 72)
 
-        scores = {}
-        for name, matrix in movie_feature_matrices.items():
-            score, feature_scores = calculate_score(matrix, user_emotions, weights)
-            scores[name] = score
+        all_scores, all_feature_scores = calculate_scores(MOVIE_MATRICES, user_emotions, weights)
+        scores = dict(zip(MOVIE_NAMES, all_scores))
+        for name, feature_scores in zip(MOVIE_NAMES, all_feature_scores):
             feature_scores_str = ', '.join(f"{v:.2f}" for v in feature_scores)
-           # print(f"{name:20} | {score:8.3f} | [{feature_scores_str}]")
+           # print(f"{name:20} | {scores[name]:8.3f} | [{feature_scores_str}]")
 
         top_movie = max(scores, key=scores.get)
         #print(f"\n🏆 RECOMMENDED MOVIE: {top_movie} — Score: {scores[top_movie]:.3f}")
@@ -112,8 +361,8 @@ def main():
     print("=" * 72)
     print(f"{'Iteration':12} | " + ' | '.join(f"{f:>8}" for f in FEATURE_NAMES))
     print("-" * 72)
-    for idx, w in enumerate(weight_evolution):
-        label = "Initial" if idx == 0 else f"Iter {idx}"
+    for step, w in zip(weight_evolution.steps, weight_evolution):
+        label = "Initial" if step == 0 else f"Iter {step}"
         values = ' | '.join(f"{v:8.3f}" for v in w)
         print(f"{label:12} | {values}")
 
@@ -134,18 +383,13 @@ def main():
 
     #print(f"\nFinal Weights Sum Check: {np.sum(final):.6f}")
 
-    evolution_array = np.array(weight_evolution)
-    plt.figure(figsize=(10, 6))
-    for idx, feature in enumerate(FEATURE_NAMES):
-        plt.plot(evolution_array[:, idx], marker='o', label=feature)
-    plt.title("Feature Weight Evolution")
-    plt.xlabel("Iteration")
-    plt.ylabel("Weight Value")
-    plt.xticks(range(len(weight_evolution)), ["Initial"] + [f"Iter {i}" for i in range(1, len(weight_evolution))])
-    plt.legend()
-    plt.grid(True)
-    plt.tight_layout()
-    #plt.show()
+    if report:
+        plot_weight_evolution(weight_evolution, report)
 
 if __name__ == "__main__":
-    main()
+    # python dynamic_ratios.py [--report [chart.png]]
+    if "--report" in sys.argv:
+        args = sys.argv[sys.argv.index("--report") + 1:]
+        main(report=args[0] if args else "weight_evolution.png")
+    else:
+        main()
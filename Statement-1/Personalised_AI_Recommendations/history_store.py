@@ -0,0 +1,272 @@
+"""
+Persistent Per-User Watch History Store for the Fire TV Recommendation Engine
+
+Every watch event is appended to a binary event log and folded into the user's
+accumulated history matrix with the recurrence of preprocessing_with_history.py,
+    A <- exp(-beta) * A + (1 - exp(-beta)) * M_new
+over the last `window` events, exactly as HistoryAccumulator(window, beta) does: a
+store with the default window of 20 gives the same matrices as main() there.
+Snapshots of all accumulators are written periodically together with the log offset
+they cover, so recovery loads the latest snapshot and replays only the log tail.
+
+Durability: appends are buffered and flushed to the OS once `flush_every` events
+or `flush_interval` seconds have gone by since the last flush (checked when events
+are recorded; flush_every=1 flushes every batch), and with fsync=True also synced
+to disk. A crash loses at most the events recorded since that flush; close() and
+snapshot() always flush and sync.
+
+Files in the store directory:
+    events.log      magic + fixed-size little-endian records
+                    (user id u64, view time f64, catalog id u32, compat float32 6×4)
+    snapshot.npz    user ids, accumulators, event counts, the events still inside
+                    each user's window and the covered log offset, written to a
+                    temporary file and renamed into place
+"""
+
+import os
+import tempfile
+import time
+import numpy as np
+from typing import Dict, Optional
+
+from preprocessing_with_history import EVICTION_EPSILON
+
+LOG_MAGIC = b"FTVHLOG1"
+EVENT_DTYPE = np.dtype([
+    ("user", "<u8"),
+    ("time", "<f8"),
+    ("catalog_id", "<u4"),
+    ("compat", "<f4", (6, 4)),
+])
+
+
+class HistoryStore:
+    """
+    Durable history matrices for many users, backed by an event log and snapshots
+    """
+
+    LOG_NAME = "events.log"
+    SNAPSHOT_NAME = "snapshot.npz"
+
+    def __init__(self, directory: str, beta: float = 0.5, window: int = 20, snapshot_every: int = 1_000_000,
+                 flush_every: int = 4096, flush_interval: float = 1.0, fsync: bool = False):
+        self.directory = directory
+        self.beta, self.window = beta, window
+        self.decay = np.exp(-beta)
+        self.gain = 1.0 - self.decay
+        self.snapshot_every = snapshot_every
+        self.flush_every, self.flush_interval, self.fsync = flush_every, flush_interval, fsync
+        os.makedirs(directory, exist_ok=True)
+
+        # As in HistoryAccumulator: keep the events inside the window only while the
+        # oldest one still weighs enough to be worth subtracting
+        self.keeps_entries = bool(window) and self.gain * self.decay ** window >= EVICTION_EPSILON
+        self.rows: Dict[int, int] = {}
+        self.user_ids = np.zeros(0, dtype=np.uint64)
+        self.accumulators = np.zeros((0, 6, 4))
+        self.counts = np.zeros(0, dtype=np.int64)
+        # Events inside each user's window (compat as logged, float32) in a ring per user;
+        # heads is the slot the user's next event goes to
+        self.entries = np.zeros((0, window if self.keeps_entries else 0, 6, 4), dtype=np.float32)
+        self.heads = np.zeros(0, dtype=np.int64)
+        self.size = 0
+        self.events_since_snapshot = 0
+        self.unflushed = 0
+        self.last_flush = time.monotonic()
+
+        self.log_path = os.path.join(directory, self.LOG_NAME)
+        self.snapshot_path = os.path.join(directory, self.SNAPSHOT_NAME)
+        self.recover()
+        self.log = open(self.log_path, "ab")
+
+    def __len__(self) -> int:
+        return self.size
+
+    # ----- user rows ------------------------------------------------------
+
+    def _grow(self, capacity: int):
+        capacity = max(capacity, 2 * len(self.counts), 1024)
+        self.user_ids = np.resize(self.user_ids, capacity)
+        self.accumulators = np.concatenate([self.accumulators, np.zeros((capacity - len(self.counts), 6, 4))])
+        self.entries = np.concatenate([self.entries, np.zeros((capacity - len(self.counts),) + self.entries.shape[1:],
+                                                              dtype=np.float32)])
+        self.heads = np.concatenate([self.heads, np.zeros(capacity - len(self.counts), dtype=np.int64)])
+        self.counts = np.concatenate([self.counts, np.zeros(capacity - len(self.counts), dtype=np.int64)])
+
+    def _rows_for(self, users: np.ndarray) -> np.ndarray:
+        """Row of every user id, allocating rows for unseen users"""
+        unique, inverse = np.unique(users, return_inverse=True)
+        rows = np.empty(len(unique), dtype=np.int64)
+        for i, user in enumerate(unique.tolist()):
+            row = self.rows.get(user)
+            if row is None:
+                if self.size == len(self.counts):
+                    self._grow(self.size + 1)
+                row = self.rows[user] = self.size
+                self.user_ids[row] = user
+                self.size += 1
+            rows[i] = row
+        return rows[inverse]
+
+    # ----- applying events ------------------------------------------------
+
+    def _apply(self, events: np.ndarray):
+        """Fold a batch of events (in log order) into the accumulators"""
+        if len(events) == 0:
+            return
+        rows = self._rows_for(events["user"])
+
+        # Position of every event within its user's batch, counted from the newest
+        order = np.argsort(rows, kind="stable")
+        sorted_rows = rows[order]
+        starts = np.flatnonzero(np.r_[True, sorted_rows[1:] != sorted_rows[:-1]])
+        lengths = np.diff(np.r_[starts, len(rows)])
+        rank = np.arange(len(rows)) - np.repeat(starts, lengths)
+        age = np.empty(len(rows), dtype=np.int64)
+        age[order] = np.repeat(lengths, lengths) - 1 - rank
+
+        batch_rows = sorted_rows[starts]
+        self.accumulators[batch_rows] *= (self.decay ** lengths)[:, np.newaxis, np.newaxis]
+        if self.keeps_entries:
+            self._evict(batch_rows, lengths)
+            self.heads[batch_rows] = (self.heads[batch_rows] + lengths) % self.window
+            # Events already out of the window by the end of the batch are never added
+            inside = age < self.window
+            rows, age, events = rows[inside], age[inside], events[inside]
+            self.entries[rows, (self.heads[rows] - 1 - age) % self.window] = events["compat"]
+        weights = self.gain * self.decay ** age
+        np.add.at(self.accumulators, rows, weights[:, np.newaxis, np.newaxis] * events["compat"])
+        self.counts[batch_rows] += lengths
+        if self.window:
+            self.counts[batch_rows] = np.minimum(self.counts[batch_rows], self.window)
+
+    def _evict(self, batch_rows: np.ndarray, lengths: np.ndarray):
+        """
+        Subtract the stored events the new batch pushes out of the window (accumulators
+        already decayed by the batch): an event of age a before the batch now weighs
+        (1 - r) * r^(a + length), and leaves once a + length >= window
+        """
+        stored = np.minimum(self.counts[batch_rows], self.window)
+        first = np.minimum(stored, np.maximum(self.window - lengths, 0))
+        evicted = stored - first
+        if not evicted.any():
+            return
+        users = np.repeat(np.arange(len(batch_rows)), evicted)
+        age = np.repeat(first, evicted) + np.arange(evicted.sum()) - np.repeat(np.cumsum(evicted) - evicted, evicted)
+        rows = batch_rows[users]
+        leaving = self.entries[rows, (self.heads[rows] - 1 - age) % self.window]
+        weights = self.gain * self.decay ** (age + lengths[users])
+        np.add.at(self.accumulators, rows, -weights[:, np.newaxis, np.newaxis] * leaving)
+
+    def record(self, user_id: int, compat: np.ndarray, view_time: Optional[float] = None, catalog_id: int = 0):
+        """Append one watch event to the log and fold it into the user's history"""
+        event = np.zeros(1, dtype=EVENT_DTYPE)
+        event["user"] = user_id
+        event["time"] = time.time() if view_time is None else view_time
+        event["catalog_id"] = catalog_id
+        event["compat"] = compat
+        self.record_batch(event)
+
+    def record_batch(self, events: np.ndarray):
+        """Append a structured EVENT_DTYPE array of events, oldest first"""
+        events = np.asarray(events, dtype=EVENT_DTYPE)
+        self.log.write(events.tobytes())
+        self._apply(events)
+
+        self.unflushed += len(events)
+        if self.unflushed >= self.flush_every or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush(sync=self.fsync)
+
+        self.events_since_snapshot += len(events)
+        if self.events_since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def matrix(self, user_id: int) -> np.ndarray:
+        """Normalised 6x4 history matrix of a user (zeros for unknown users)"""
+        row = self.rows.get(user_id)
+        if row is None or self.counts[row] == 0:
+            return np.zeros((6, 4))
+        return self.accumulators[row] / (1.0 - self.decay ** self.counts[row])
+
+    # ----- durability -----------------------------------------------------
+
+    def flush(self, sync: bool = False):
+        """Hand buffered events to the OS; sync=True also waits until they are on disk"""
+        self.log.flush()
+        if sync:
+            os.fsync(self.log.fileno())
+        self.unflushed = 0
+        self.last_flush = time.monotonic()
+
+    def snapshot(self):
+        """Write all accumulators and the log offset they cover atomically"""
+        self.flush(sync=True)
+        offset = self.log.tell()
+
+        fd, temp_path = tempfile.mkstemp(prefix=".snapshot-", suffix=".npz", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, user_ids=self.user_ids[:self.size], accumulators=self.accumulators[:self.size],
+                         counts=self.counts[:self.size], entries=self.entries[:self.size], heads=self.heads[:self.size],
+                         beta=self.beta, window=self.window, log_offset=offset)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.snapshot_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        self.events_since_snapshot = 0
+
+    def recover(self, chunk_events: int = 1 << 20):
+        """
+        Load the latest snapshot and replay the log from the offset it covers
+
+        A snapshot taken with another beta or window (or without windows) is ignored
+        and the whole log is replayed instead
+        """
+        offset = len(LOG_MAGIC)
+        if os.path.exists(self.snapshot_path):
+            with np.load(self.snapshot_path) as snapshot:
+                if ("entries" in snapshot and float(snapshot["beta"]) == self.beta
+                        and int(snapshot["window"]) == self.window):
+                    self.size = len(snapshot["counts"])
+                    self.user_ids = snapshot["user_ids"].copy()
+                    self.accumulators = snapshot["accumulators"].copy()
+                    self.counts = snapshot["counts"].copy()
+                    self.entries = snapshot["entries"].copy()
+                    self.heads = snapshot["heads"].copy()
+                    offset = int(snapshot["log_offset"])
+            self.rows = {user: row for row, user in enumerate(self.user_ids[:self.size].tolist())}
+
+        if not os.path.exists(self.log_path) or os.path.getsize(self.log_path) == 0:
+            with open(self.log_path, "wb") as f:
+                f.write(LOG_MAGIC)
+            return
+
+        with open(self.log_path, "r+b") as f:
+            if f.read(len(LOG_MAGIC)) != LOG_MAGIC:
+                raise ValueError(f"{self.log_path} is not a history event log")
+
+            # Drop a record torn by a crash in the middle of an append
+            size = os.path.getsize(self.log_path)
+            complete = size - (size - len(LOG_MAGIC)) % EVENT_DTYPE.itemsize
+            if complete != size:
+                f.truncate(complete)
+
+            f.seek(offset)
+            while True:
+                events = np.fromfile(f, dtype=EVENT_DTYPE, count=chunk_events)
+                if len(events) == 0:
+                    break
+                self._apply(events)
+                self.events_since_snapshot += len(events)
+
+    def close(self):
+        self.flush(sync=True)
+        self.log.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -9,19 +9,35 @@ The processed user input from this step will be passed to the final recommendati
 Optimization:
 - Multiply the existing previous history matrix by exp(-0.5)
 - Add the recent transposed movie matrix (multiplied by 0.3935)
+
+Per-user histories that survive restarts are kept by history_store.HistoryStore
+(main(history_dir=...) or `python preprocessing_with_history.py <dir>`).
 '''
 
 
 
 import numpy as np
-import random
 import datetime
+import os
+import sys
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from Personalised_recommendations import simulate_user_matrices
 
 # Define constants
 MODALITIES = ["Time", "Behavior", "Voice", "Facial"]
 ATTRIBUTES = ["Primary", "Secondary", "Tertiary", "Quaternary", "Quinary", "Senary"]
 
+# Share of the history matrix in the processed user matrix
+HISTORY_SHARE = 0.2
+
+# Below this weight an entry leaving the history window is not worth remembering
+EVICTION_EPSILON = 1e-12
+
+# Default half-life of a watched movie for time-aware decay
+HISTORY_HALF_LIFE = datetime.timedelta(days=7)
+
 # Base movie database
 BASE_MOVIES = [
     {
@@ -91,6 +107,9 @@ BASE_MOVIES = [
     }
 ]
 
+# Base compat matrices indexed by catalog id, for compact history entries
+BASE_COMPAT = np.stack([movie["compat"] for movie in BASE_MOVIES])
+
 def calculate_exponential_decay_weights(num_movies, alpha=1.0, beta=0.5):
     """
     Calculate exponential decay weights for movie history.
@@ -101,14 +120,236 @@ def calculate_exponential_decay_weights(num_movies, alpha=1.0, beta=0.5):
     # Normalize weights to sum to 1
     return weights / np.sum(weights)
 
-def simulate_user_matrix():
+def calculate_time_decay_weights(view_times, now=None, half_life=HISTORY_HALF_LIFE):
+    """
+    Calculate time-aware decay weights from each movie's view_time.
+    A movie watched one half-life before `now` weighs half as much as one watched at `now`.
+    Total weights sum to 1.
+    """
+    now = now or datetime.datetime.now()
+    ages = np.array([(now - view_time) / half_life for view_time in view_times])
+    # Shift by the youngest age so the largest weight is 1 and nothing underflows
+    weights = np.exp2(-(ages - ages.min()))
+    return weights / np.sum(weights)
+
+def weighted_history_matrix(movie_history, weights):
+    """Weighted sum of the history compatibility matrices (6x4), most recent first."""
+    history_matrix = np.zeros((6, 4))
+    for i, movie in enumerate(movie_history):
+        history_matrix += weights[i] * movie["compat"]
+    return history_matrix
+
+class HistoryAccumulator:
+    """
+    Incrementally maintained history matrix for one user.
+
+    Each watch event applies the recurrence from the module docstring,
+        A <- exp(-beta) * A + (1 - exp(-beta)) * M_new     (0.6065 / 0.3935 for beta = 0.5)
+    so after n events A = (1 - r) * sum(r^i * M_i) with r = exp(-beta), most recent first.
+    Dividing by (1 - r^n) renormalises the truncated geometric weights, which gives exactly
+    the weights of calculate_exponential_decay_weights(n, beta=beta). Once the window is
+    full, the entry falling out of it is subtracted with its weight (1 - r) * r^window.
+
+    Memory per user is bounded whatever the window. The entries inside the window live in a
+    fixed ring buffer: with a catalog (base compat matrices indexed by catalog id) each entry
+    is its catalog id plus the noise delta in thousandths as int8, otherwise the compat
+    matrix itself. When the weight of an entry leaving the window is below
+    EVICTION_EPSILON (window >= 54 for beta = 0.5) nothing is stored at all: the entry has
+    already been folded into the accumulator for good.
+    """
+    
+    def __init__(self, window=20, beta=0.5, catalog=None):
+        self.window = window
+        self.decay = np.exp(-beta)
+        self.gain = 1.0 - self.decay
+        self.evict_weight = self.gain * self.decay ** window if window else 0.0
+        self.accumulator = np.zeros((6, 4))
+        self.count = 0
+        
+        self.catalog = catalog
+        self.head = 0    # ring slot of the oldest stored entry
+        self.stored = 0
+        self.keeps_entries = self.evict_weight >= EVICTION_EPSILON
+        if self.keeps_entries and catalog is not None:
+            self.catalog_ids = np.zeros(window, dtype=np.int32)
+            self.deltas = np.zeros((window, 6, 4), dtype=np.int8)
+        elif self.keeps_entries:
+            self.entries = np.zeros((window, 6, 4))
+    
+    @classmethod
+    def from_history(cls, movie_history, window=20, beta=0.5, catalog=None):
+        """Build an accumulator from a most-recent-first history list."""
+        accumulator = cls(window, beta, catalog)
+        for movie in reversed(movie_history):
+            accumulator.push(movie["compat"], movie.get("catalog_id"))
+        return accumulator
+    
+    def _store(self, slot, compat, catalog_id):
+        """Store an entry in a ring slot and return the matrix as it will be evicted."""
+        if self.catalog is None:
+            self.entries[slot] = compat
+            return compat
+        base = self.catalog[catalog_id]
+        delta = np.rint((compat - base) * 1000)
+        if np.abs(delta).max() > 127:
+            raise ValueError(f"compat deviates from catalog entry {catalog_id} by more than 0.127")
+        self.catalog_ids[slot] = catalog_id
+        self.deltas[slot] = delta
+        return base + self.deltas[slot] / 1000
+    
+    def _stored_entry(self, slot):
+        if self.catalog is None:
+            return self.entries[slot]
+        return self.catalog[self.catalog_ids[slot]] + self.deltas[slot] / 1000
+    
+    def push(self, compat, catalog_id=None):
+        """Fold one watched movie's 6x4 compatibility matrix into the history."""
+        if not self.keeps_entries:
+            self.accumulator *= self.decay
+            self.accumulator += self.gain * compat
+            self.count = min(self.count + 1, self.window or self.count + 1)
+            return
+        
+        if self.stored == self.window:
+            # Evict before decaying, while the oldest entry still weighs (1 - r) * r^(window - 1)
+            slot = self.head
+            self.accumulator -= self.gain * self.decay ** (self.window - 1) * self._stored_entry(slot)
+            self.head = (self.head + 1) % self.window
+        else:
+            slot = (self.head + self.stored) % self.window
+            self.stored += 1
+            self.count += 1
+        
+        # Add the stored form, so that eviction later subtracts exactly what was added
+        compat = self._store(slot, compat, catalog_id)
+        self.accumulator *= self.decay
+        self.accumulator += self.gain * compat
+    
+    def matrix(self):
+        """Normalised history matrix (6x4), equal to the batch weighted sum."""
+        if self.count == 0:
+            return np.zeros((6, 4))
+        return self.accumulator / (1.0 - self.decay ** self.count)
+
+def simulate_user_matrix(rng=None):
     """Simulate a 4x6 user preference matrix (modalities x attributes)."""
-    user_matrix = np.zeros((4, 6))
-    user_matrix[0, :] = np.random.dirichlet([2, 3, 4, 5, 3, 2])  # Time
-    user_matrix[1, :] = np.random.dirichlet([3, 2, 4, 2, 2, 3])  # Behavior
-    user_matrix[2, :] = np.random.dirichlet([3, 2, 3, 4, 3, 2])  # Voice
-    user_matrix[3, :] = np.random.dirichlet([3, 3, 2, 3, 3, 2])  # Facial
-    return np.round(user_matrix, 3)
+    return simulate_user_matrices(1, rng)[0]
+
+class TimeDecayAccumulator:
+    """
+    Incrementally maintained history matrix with wall-clock decay.
+
+    The weighted sum and the total weight are stored relative to a reference time (the
+    latest view_time seen), S = sum 2^(-(t_ref - t_i) / h) * M_i. Advancing time scales S and
+    the total weight by the same factor, so the normalised matrix never needs rescaling;
+    only the absolute weight (mass) is rescaled, lazily, when it is read. The accumulator
+    is rebased only when a newer view_time is pushed, never when time merely passes.
+    """
+    
+    def __init__(self, half_life=HISTORY_HALF_LIFE):
+        self.half_life = half_life
+        self.reference_time = None
+        self.accumulator = np.zeros((6, 4))
+        self.total_weight = 0.0
+    
+    @classmethod
+    def from_history(cls, movie_history, half_life=HISTORY_HALF_LIFE):
+        """Build an accumulator from history entries carrying compat and view_time."""
+        accumulator = cls(half_life)
+        for movie in movie_history:
+            accumulator.push(movie["compat"], movie["view_time"])
+        return accumulator
+    
+    def _decay(self, elapsed):
+        return 2.0 ** (-(elapsed / self.half_life))
+    
+    def push(self, compat, view_time):
+        """Fold one watched movie into the history; view_times may arrive out of order."""
+        if self.reference_time is None:
+            self.reference_time = view_time
+        elif view_time > self.reference_time:
+            # Rebase onto the newer event
+            factor = self._decay(view_time - self.reference_time)
+            self.accumulator *= factor
+            self.total_weight *= factor
+            self.reference_time = view_time
+        
+        weight = self._decay(self.reference_time - view_time)
+        self.accumulator += weight * compat
+        self.total_weight += weight
+    
+    def matrix(self):
+        """Normalised history matrix (6x4), equal to calculate_time_decay_weights applied at any time."""
+        if self.total_weight == 0.0:
+            return np.zeros((6, 4))
+        return self.accumulator / self.total_weight
+    
+    def mass(self, now=None):
+        """Total decayed weight of the history at `now`; small values mark a stale history."""
+        if self.reference_time is None:
+            return 0.0
+        now = now or datetime.datetime.now()
+        return self.total_weight * self._decay(now - self.reference_time)
+
+def segment_decay_weights(offsets, beta=0.5):
+    """
+    Exponential decay weights for ragged histories stacked most recent first.
+    offsets has one entry per user plus one: user u owns rows offsets[u]:offsets[u+1].
+    Every segment gets the weights of calculate_exponential_decay_weights(length, beta=beta).
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = np.diff(offsets)
+    positions = np.arange(offsets[-1] - offsets[0]) - np.repeat(offsets[:-1] - offsets[0], lengths)
+    weights = np.exp(-beta * positions)
+    # Geometric series: sum of r^i for i < n is (1 - r^n) / (1 - r)
+    decay = np.exp(-beta)
+    totals = (1.0 - decay ** lengths) / (1.0 - decay) if beta else lengths.astype(float)
+    return weights / np.repeat(totals, lengths)
+
+def aggregate_histories(compat, offsets, beta=0.5):
+    """
+    Weighted history matrices (U x 6 x 4) for many users at once.
+    compat is the stacked N x 6 x 4 array of all histories, offsets as in segment_decay_weights.
+    Users with an empty history get a zero matrix.
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    compat = np.asarray(compat, dtype=float)[offsets[0]:offsets[-1]]
+    starts = offsets[:-1] - offsets[0]
+    lengths = np.diff(offsets)
+    history = np.zeros((len(starts), 6, 4))
+    
+    filled = lengths > 0
+    if filled.any():
+        weighted = compat * segment_decay_weights(offsets, beta)[:, np.newaxis, np.newaxis]
+        # reduceat needs strictly valid start indices, so reduce over the non-empty segments only
+        history[filled] = np.add.reduceat(weighted, starts[filled], axis=0)
+    return history
+
+def process_user_matrices(user_matrices, compat, offsets, beta=0.5, chunk_size=4096, workers=None):
+    """
+    Processed 4x6 user matrices for a batch of users, as main() computes them for one:
+    80% user input + 20% transposed history matrix, both rounded to three decimals.
+    Users are split into chunks which are aggregated on a thread pool.
+    """
+    user_matrices = np.asarray(user_matrices, dtype=float)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    count = len(user_matrices)
+    processed = np.empty((count, 4, 6))
+    
+    def run(start):
+        stop = min(start + chunk_size, count)
+        history = np.round(aggregate_histories(compat, offsets[start:stop + 1], beta), 3)
+        processed[start:stop] = np.round(
+            (1 - HISTORY_SHARE) * user_matrices[start:stop] + HISTORY_SHARE * history.transpose(0, 2, 1), 3)
+    
+    starts = range(0, count, chunk_size)
+    if workers == 1 or count <= chunk_size:
+        for start in starts:
+            run(start)
+    else:
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            list(pool.map(run, starts))
+    return processed
 
 def print_matrix(matrix, row_labels, col_labels, title):
     """Print a matrix with row and column labels."""
@@ -131,39 +372,74 @@ def print_matrix(matrix, row_labels, col_labels, title):
             print(f"{matrix[i, j]:12.3f}", end="")
         print()
 
-def generate_movie_history(num_movies=20):
-    """Generate a movie history with slightly modified compatibility matrices."""
-    np.random.seed(42)
+def generate_movie_history(num_movies=20, rng=42):
+    """
+    Generate a movie history with slightly modified compatibility matrices.
+    rng is a seed or numpy Generator, so histories are reproducible per caller.
+    """
+    rng = np.random.default_rng(rng)
     history = deque(maxlen=num_movies)
     
     for i in range(num_movies):
         # Select a random base movie
-        base_movie = random.choice(BASE_MOVIES).copy()
+        catalog_id = int(rng.integers(len(BASE_MOVIES)))
+        base_movie = BASE_MOVIES[catalog_id].copy()
+        base_movie["catalog_id"] = catalog_id
         
         # Create a slightly modified version
-        noise = 0.1 * (2 * np.random.random((6, 4)) - 1)  # ±10% variation
+        noise = 0.1 * (2 * rng.random((6, 4)) - 1)  # ±10% variation
         modified_compat = np.clip(base_movie["compat"] + noise, 0, 1)
         
         # Add to history with a new title
         base_movie["compat"] = np.round(modified_compat, 3)
-        base_movie["view_time"] = datetime.datetime.now() - datetime.timedelta(days=random.randint(0, 30))
+        base_movie["view_time"] = datetime.datetime.now() - datetime.timedelta(days=int(rng.integers(0, 31)))
         history.appendleft(base_movie)  # Most recent first
     
     return list(history)
 
-def main():
-    """Main function to run the Fire TV History-Aware Recommendation Engine."""
+def stored_history_matrix(history_dir, movie_history, user_id=0):
+    """Append a most-recent-first history to the persistent store and read the user's matrix back."""
+    # history_store imports this module, so import it only when a store is used
+    from history_store import EVENT_DTYPE, HistoryStore
+    
+    oldest_first = movie_history[::-1]
+    events = np.zeros(len(oldest_first), dtype=EVENT_DTYPE)
+    events["user"] = user_id
+    events["time"] = [movie["view_time"].timestamp() for movie in oldest_first]
+    events["catalog_id"] = [movie.get("catalog_id", 0) for movie in oldest_first]
+    events["compat"] = [movie["compat"] for movie in oldest_first]
+    with HistoryStore(history_dir) as store:
+        store.record_batch(events)
+        return store.matrix(user_id)
+
+def main(seed=42, decay="position", history_dir=None):
+    """
+    Main function to run the Fire TV History-Aware Recommendation Engine.
+    decay is "position" (weights by rank in the history) or "time" (weights by view_time).
+    With history_dir the history is recorded for user 0 in a history_store.HistoryStore
+    kept in that directory and the history matrix is read back from the store; its
+    20-event window gives the same matrix as position decay over the generated history,
+    so it cannot be combined with decay="time".
+    """
+    if history_dir is not None and decay != "position":
+        raise ValueError("A history store applies position decay; use decay=\"position\" with history_dir")
     print("=" * 80)
     print("FIRE TV HISTORY-AWARE RECOMMENDATION ENGINE - MULTI-MODAL MATRIX PROTOTYPE")
     print("=" * 80)
     now = datetime.datetime.now()
     print(f"Analysis at {now.strftime('%Y-%m-%d %I:%M:%S %p')}\n")
     
+    # One seeded generator drives every simulated input
+    rng = np.random.default_rng(seed)
+    
     # Generate movie history (20 most recent movies)
-    movie_history = generate_movie_history(20)
+    movie_history = generate_movie_history(20, rng)
     
     # Calculate exponential decay weights for the movies
-    weights = calculate_exponential_decay_weights(len(movie_history))
+    if decay == "time":
+        weights = calculate_time_decay_weights([movie["view_time"] for movie in movie_history], now)
+    else:
+        weights = calculate_exponential_decay_weights(len(movie_history))
     
     # Display weights
     print("\nExponential Decay Weights for Movie History (Most Recent First):")
@@ -172,19 +448,19 @@ def main():
         print(f"{i+1:2}. {movie['title']:20} ({movie['genre']:20}) Weight: {weight:.4f}")
     
     # Calculate the weighted sum of movie compatibility matrices
-    history_matrix = np.zeros((6, 4))
-    for i, movie in enumerate(movie_history):
-        history_matrix += weights[i] * movie["compat"]
-    history_matrix = np.round(history_matrix, 3)
+    if history_dir is not None:
+        history_matrix = np.round(stored_history_matrix(history_dir, movie_history), 3)
+    else:
+        history_matrix = np.round(weighted_history_matrix(movie_history, weights), 3)
     
     # Transpose the history matrix to get a 4x6 matrix
     history_matrix_transposed = np.round(history_matrix.T, 3)
     
     # Generate the user input matrix (4x6)
-    user_input_matrix = simulate_user_matrix()
+    user_input_matrix = simulate_user_matrix(rng)
     
     # Combine user input (80%) with history (20%)
-    processed_user_matrix = np.round(0.8 * user_input_matrix + 0.2 * history_matrix_transposed, 3)
+    processed_user_matrix = np.round((1 - HISTORY_SHARE) * user_input_matrix + HISTORY_SHARE * history_matrix_transposed, 3)
     
     # Print all matrices
     
@@ -194,4 +470,5 @@ def main():
     
 
 if __name__ == "__main__":
-    main()
+    # Optional argument: directory of a persistent history store
+    main(history_dir=sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,108 @@
+"""
+Approximate Retrieval Index for the Fire TV Recommendation Engine
+
+The consensus score is linear in the per-modality diagonal terms, so every movie
+reduces to a fixed-length item vector and every user to a query vector of the same
+length: score = query · item. This module implements an inverted-file (IVF) index
+in pure NumPy for maximum inner product search over those vectors.
+
+Build: items are lifted to equal norm (MIPS → nearest-neighbour reduction) and
+       k-means clusters them into n_lists inverted lists
+Search: only the n_probe lists with the nearest centroids are scanned and the best
+        n_candidates rows are returned for exact rescoring
+"""
+
+import numpy as np
+from typing import Optional
+
+
+class IVFIndex:
+    """
+    Inverted-file index over item vectors for approximate maximum inner product search
+    """
+
+    def __init__(self, vectors: np.ndarray, n_lists: Optional[int] = None, n_iter: int = 10,
+                 seed: int = 0, train_size: int = 65536):
+        vectors = self._augment(np.asarray(vectors, dtype=np.float32))
+        count = len(vectors)
+        if n_lists is None:
+            n_lists = int(np.sqrt(count))
+        self.n_lists = max(1, min(n_lists, count))
+
+        rng = np.random.default_rng(seed)
+        self.centroids = self._train(vectors, rng, n_iter, train_size)
+        self._centroid_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+
+        # Group rows by list so that every list is one contiguous block
+        assignments = self._assign(vectors, self.centroids)
+        order = np.argsort(assignments, kind='stable')
+        self.ids = order.astype(np.int64)
+        self.vectors = vectors[order]
+        self.offsets = np.zeros(self.n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=self.n_lists), out=self.offsets[1:])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @staticmethod
+    def _augment(vectors: np.ndarray) -> np.ndarray:
+        """
+        Append sqrt(M² - ||x||²) so every item has norm M; the largest inner product with a
+        query (extended by 0) then is the nearest item in L2, which k-means clusters well
+        """
+        norms = np.einsum('ij,ij->i', vectors, vectors)
+        extra = np.sqrt(np.maximum(norms.max(initial=0.0) - norms, 0.0))
+        return np.ascontiguousarray(np.hstack([vectors, extra[:, np.newaxis]]))
+
+    def _train(self, vectors: np.ndarray, rng: np.random.Generator, n_iter: int, train_size: int) -> np.ndarray:
+        """Lloyd's k-means on a random training sample"""
+        if len(vectors) > train_size:
+            sample = vectors[rng.choice(len(vectors), train_size, replace=False)]
+        else:
+            sample = vectors
+        centroids = sample[rng.choice(len(sample), self.n_lists, replace=False)].copy()
+
+        for _ in range(n_iter):
+            assignments = self._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            counts = np.bincount(assignments, minlength=self.n_lists)
+
+            # Empty lists keep their previous centroid
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, np.newaxis]
+        return centroids
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 16384) -> np.ndarray:
+        """Nearest centroid (squared L2) for every vector, chunked to bound memory"""
+        assignments = np.empty(len(vectors), dtype=np.int64)
+        centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+        for start in range(0, len(vectors), chunk):
+            block = vectors[start:start + chunk]
+            # ||x - c||² up to the constant ||x||²
+            distances = centroid_norms[np.newaxis, :] - 2.0 * (block @ centroids.T)
+            assignments[start:start + chunk] = np.argmin(distances, axis=1)
+        return assignments
+
+    def search(self, query: np.ndarray, n_candidates: int = 300, n_probe: int = 8) -> np.ndarray:
+        """
+        Row ids of (approximately) the n_candidates highest inner products with the query,
+        best first, scanning only the n_probe lists with the nearest centroids
+        """
+        query = np.append(np.asarray(query, dtype=np.float32), np.float32(0))
+        n_probe = min(n_probe, self.n_lists)
+
+        # Probe the lists whose centroids are nearest to the query in the augmented space
+        centroid_distances = self._centroid_norms - 2.0 * (self.centroids @ query)
+        probed = np.argpartition(centroid_distances, n_probe - 1)[:n_probe]
+
+        rows = np.concatenate([np.arange(self.offsets[l], self.offsets[l + 1]) for l in probed])
+        if len(rows) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        scores = self.vectors[rows] @ query
+        n_candidates = min(n_candidates, len(rows))
+        best = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return self.ids[rows[best]]
@@ -0,0 +1,154 @@
+"""
+Simulation Harness for the Adaptive Weight Loop of dynamic_ratios.py
+
+Runs many synthetic feedback trajectories through the same loop as dynamic_ratios.main():
+score every movie with calculate_score, recommend the best one, then fold the user's
+feedback into the feature weights with update_weights. Scenarios (feedback distribution ×
+momentum) run in parallel on a process pool, each with its own seeded generator.
+
+Run as:
+    python weight_simulation.py [trajectories] [steps] [workers]
+
+Reported per scenario:
+    converged at  – step after which the weights stay within `tolerance` (max abs,
+                    averaged over trajectories) of the weights the feedback distribution
+                    is expected to produce; for drifting feedback, after the drift
+    error         – that averaged distance at the last step (how noisy the weights stay)
+    preferred     – final weight on each trajectory's preferred feature (the one its
+                    expected weights favour at the last step), averaged over trajectories;
+                    a plain mean of the weights would wash out, since every trajectory
+                    draws its own preferred feature
+    expected      – the weight the feedback distribution implies for that feature
+    top movie     – most frequently recommended movie at the last step
+"""
+
+import os
+import sys
+import time
+import numpy as np
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from dynamic_ratios import (
+    INITIAL_WEIGHTS, calculate_score, movie_feature_matrices, update_weights, user_emotions
+)
+
+MOMENTA = [0.3, 0.6, 0.8, 0.9]
+
+
+# Every distribution returns (feedback, expected weights), both steps x 4
+
+def uniform_feedback(rng, steps):
+    """Feedback with no preferred feature"""
+    return rng.uniform(0.1, 1.0, size=(steps, 4)), np.full((steps, 4), 0.25)
+
+
+def preferred_feedback(rng, steps):
+    """Feedback concentrated on one random preferred feature"""
+    alphas = np.full(4, 2.0)
+    alphas[rng.integers(4)] = 6.0
+    return rng.dirichlet(alphas, size=steps), np.tile(alphas / alphas.sum(), (steps, 1))
+
+
+def drifting_feedback(rng, steps):
+    """Preference that switches to another feature halfway through"""
+    first, second = rng.choice(4, size=2, replace=False)
+    alphas = np.full((steps, 4), 2.0)
+    alphas[:steps // 2, first] = 6.0
+    alphas[steps // 2:, second] = 6.0
+    feedback = rng.standard_gamma(alphas)
+    return feedback / feedback.sum(axis=1, keepdims=True), alphas / alphas.sum(axis=1, keepdims=True)
+
+
+FEEDBACK_DISTRIBUTIONS = {
+    "uniform": uniform_feedback,
+    "preferred": preferred_feedback,
+    "drifting": drifting_feedback,
+}
+
+
+def convergence_step(errors, tolerance):
+    """First step after which the error stays within tolerance (len(errors) if it never does)"""
+    outside = np.flatnonzero(errors > tolerance)
+    return int(outside[-1]) + 1 if len(outside) else 0
+
+
+def run_trajectory(feedback, momentum):
+    """One dynamic_ratios loop over a feedback stream; returns (weights after each step, last recommendation)"""
+    weights = INITIAL_WEIGHTS.copy()
+    evolution = []
+    top_movie = None
+    for user_feedback in feedback:
+        scores = {name: calculate_score(matrix, user_emotions, weights)[0]
+                  for name, matrix in movie_feature_matrices.items()}
+        top_movie = max(scores, key=scores.get)
+        weights = update_weights(weights, user_feedback, momentum)
+        evolution.append(weights)
+    return np.array(evolution), top_movie
+
+
+def run_scenario(distribution, momentum, trajectories, steps, seed, tolerance=0.05):
+    """Run `trajectories` feedback streams for one scenario and summarise them"""
+    rng = np.random.default_rng(seed)
+    generate = FEEDBACK_DISTRIBUTIONS[distribution]
+    errors = np.zeros(steps)
+    preferred = target = 0.0
+    top_movies = Counter()
+    for _ in range(trajectories):
+        feedback, expected = generate(rng, steps)
+        evolution, top_movie = run_trajectory(feedback, momentum)
+        errors += np.abs(evolution - expected).max(axis=1)
+        feature = int(np.argmax(expected[-1]))
+        preferred += evolution[-1, feature]
+        target += expected[-1, feature]
+        top_movies[top_movie] += 1
+    errors /= trajectories
+    return {
+        "distribution": distribution,
+        "momentum": momentum,
+        "converged_at": convergence_step(errors, tolerance),
+        "error": float(errors[-1]),
+        "preferred_weight": preferred / trajectories,
+        "expected_weight": target / trajectories,
+        "top_movie": top_movies.most_common(1)[0],
+    }
+
+
+def run_simulation(trajectories=1000, steps=50, momenta=MOMENTA, distributions=None, seed=42, workers=None):
+    """Run every (distribution, momentum) scenario on a process pool; returns (results, seconds)"""
+    distributions = distributions or list(FEEDBACK_DISTRIBUTIONS)
+    scenarios = [(distribution, momentum) for distribution in distributions for momentum in momenta]
+    seeds = np.random.SeedSequence(seed).spawn(len(scenarios))
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(run_scenario, distribution, momentum, trajectories, steps, scenario_seed)
+                   for (distribution, momentum), scenario_seed in zip(scenarios, seeds)]
+        results = [future.result() for future in futures]
+    return results, time.perf_counter() - start
+
+
+def main(trajectories=1000, steps=50, workers=None):
+    results, elapsed = run_simulation(trajectories, steps, workers=workers)
+
+    print("=" * 96)
+    print("ADAPTIVE WEIGHT LOOP SIMULATION")
+    print("=" * 96)
+    print(f"{'Distribution':12} | {'Momentum':>8} | {'Converged at':>12} | {'Error':>6} | "
+          f"{'Preferred':>9} | {'Expected':>8} | {'Top movie':20}")
+    print("-" * 96)
+    for result in results:
+        movie, count = result["top_movie"]
+        converged = "never" if result["converged_at"] == steps else result["converged_at"]
+        print(f"{result['distribution']:12} | {result['momentum']:8.2f} | {converged:>12} | "
+              f"{result['error']:6.3f} | {result['preferred_weight']:9.3f} | {result['expected_weight']:8.3f} | "
+              f"{movie} ({count / trajectories:.0%})")
+
+    total_steps = len(results) * trajectories * steps
+    print("-" * 96)
+    print(f"{len(results) * trajectories} trajectories x {steps} steps in {elapsed:.2f}s "
+          f"({total_steps / elapsed:,.0f} steps/s)")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:4]))
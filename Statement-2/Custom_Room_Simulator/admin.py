@@ -1,4 +1,5 @@
-import sys, user
+import sys, room_client
+user = room_client.connect()             # resident room server if running, else user.py
 ME="AdminGPU"
 c = sys.argv[1:] or ["?"]
 
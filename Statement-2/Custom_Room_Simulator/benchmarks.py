@@ -0,0 +1,152 @@
+"""
+Room simulator benchmarks – each runs in a throw-away room under a temp directory.
+
+Run as:
+    python benchmarks.py <command> [size]
+
+Commands:
+    ops     – ops/second: user.py per-command JSON round trip vs the resident room server
+    stress  – dozens of processes vote / hand / toggle_self at once; checks no update is lost
+    users   – uid() lookups per second in a large room: linear scan vs the username index
+    storm   – group_chat.txt lines/second under a reaction storm: open per line vs ChatWriter
+"""
+
+import os, socket, subprocess, sys, tempfile, time
+from multiprocessing import Pool
+import room_store, user
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def fresh_room(participants):
+    """New room (main.py) with `participants` users and one open poll, in a temp dir (the cwd)."""
+    os.chdir(tempfile.mkdtemp(prefix="room-"))
+    subprocess.run([sys.executable, os.path.join(HERE, "main.py")], check=True, capture_output=True)
+    for i in range(1, participants + 1):
+        user.add_user("AdminGPU", f"User{i}")
+    user.poll_create("AdminGPU", "Tonight?", ["Comedy", "Horror"])
+    return next(iter(user.load()["polls"]))
+
+def workload(count, participants, poll):
+    """A reaction-heavy mix of the userX.py commands."""
+    calls = []
+    for i in range(count):
+        name = f"User{i % participants + 1}"
+        calls.append([("react", (name, "2")), ("toggle_self", (name, "video", "on" if i % 2 else "off")),
+                      ("vote", (name, poll, "Comedy")), ("hand", (name,)), ("chat", (name, f"msg {i}"))][i % 5])
+    return calls
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def bench_ops(participants=200, count=2000):
+    poll = fresh_room(participants)
+    calls = workload(count, participants, poll)
+    print(f"Participants: {participants}, ops: {count}")
+
+    start = time.perf_counter()
+    for op, args in calls:
+        getattr(user, op)(*args)
+    print(f"{'user.py (load/save per op)':30}: {count / (time.perf_counter() - start):10,.0f} ops/s")
+
+    start = time.perf_counter()
+    for _ in range(10):
+        subprocess.run([sys.executable, os.path.join(HERE, "user1.py"), "hand"], check=True)
+    print(f"{'userX.py CLI process per op':30}: {10 / (time.perf_counter() - start):10,.0f} ops/s")
+
+    from room_client import RoomClient
+    port = free_port()
+    server = subprocess.Popen([sys.executable, os.path.join(HERE, "room_server.py"), str(port)],
+                              stdout=subprocess.DEVNULL)
+    try:
+        for _ in range(100):
+            try: room = RoomClient(port=port); break
+            except OSError: time.sleep(0.05)
+        start = time.perf_counter()
+        for op, args in calls:
+            room.call(op, *args)
+        print(f"{'room server (one at a time)':30}: {count / (time.perf_counter() - start):10,.0f} ops/s")
+
+        start = time.perf_counter()
+        for i in range(0, count, 100):
+            room.call_many(calls[i:i + 100])
+        print(f"{'room server (pipelined x100)':30}: {count / (time.perf_counter() - start):10,.0f} ops/s")
+        room.call("shutdown"); room.close()
+    finally:
+        server.wait(timeout=10)
+
+def _stress_worker(job):
+    name, poll, rounds = job
+    for i in range(rounds):
+        user.vote(name, poll, "Comedy")
+        user.hand(name)
+        user.toggle_self(name, "audio", "on" if i % 2 else "off")
+    user.chat_log.flush()                 # pool workers leave through os._exit
+    return room_store.conflicts
+
+def bench_stress(processes=32, rounds=20):
+    poll = fresh_room(processes)
+    jobs = [(f"User{i}", poll, rounds) for i in range(1, processes + 1)]
+    start = time.perf_counter()
+    with Pool(processes) as pool:
+        conflicts = sum(pool.map(_stress_worker, jobs))
+    elapsed = time.perf_counter() - start
+
+    s = user.load()
+    people = {v["username"]: v["personal"] for v in s["users"].values()}
+    votes = s["polls"][poll]["votes"]["Comedy"]
+    audio = "on" if (rounds - 1) % 2 else "off"
+    lost = [n for n, _, _ in jobs if not people[n]["raised_hand"] or people[n]["audio_on"] != (audio == "on")]
+    print(f"{processes} processes x {rounds} rounds x 3 ops in {elapsed:.2f}s "
+          f"({3 * processes * rounds / elapsed:,.0f} ops/s, {conflicts} conflicts retried)")
+    print(f"Votes: {votes} / {processes * rounds} expected, users with a lost hand/toggle: {len(lost)}, "
+          f"{s['_seq']} log entries")
+    if votes != processes * rounds or lost:
+        sys.exit("LOST UPDATES")
+
+def bench_users(participants=10000, lookups=20000):
+    users = {f"{i:08x}": {"username": f"User{i}"} for i in range(participants)}
+    s = {"users": users}
+    names = [f"User{i * 7919 % participants}" for i in range(lookups)]
+    scan = lambda n,s: next((k for k,v in s["users"].items() if v["username"]==n), None)
+
+    start = time.perf_counter()
+    for n in names[:lookups // 100]: scan(n, s)
+    scanned = lookups // 100 / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for n in names: user.uid(n, s)
+    indexed = lookups / (time.perf_counter() - start)
+    print(f"Participants: {participants}")
+    print(f"{'linear scan':12}: {scanned:12,.0f} lookups/s")
+    print(f"{'user_index':12}: {indexed:12,.0f} lookups/s")
+
+def bench_storm(reactions=100000, participants=500):
+    fresh_room(0)
+    names = [f"User{i % participants + 1}" for i in range(reactions)]
+    emoji = [str(i % 4 + 1) for i in range(reactions)]
+
+    per_line = lambda ln: open(user.CHAT, "a", encoding="utf-8").write(ln + "\n")
+    start = time.perf_counter()
+    for n, e in zip(names, emoji): per_line(f"[reaction] {n}: {user.EMOJI[e]}")
+    print(f"{'open per line':14}: {reactions / (time.perf_counter() - start):12,.0f} lines/s")
+
+    open(user.CHAT, "w").close()
+    start = time.perf_counter()
+    for n, e in zip(names, emoji): user.react(n, e)
+    user.chat_log.flush()
+    print(f"{'ChatWriter':14}: {reactions / (time.perf_counter() - start):12,.0f} lines/s (via user.react)")
+
+    lines = open(user.CHAT, encoding="utf-8").read().splitlines()
+    expected = [f"[reaction] {n}: {user.EMOJI[e]}" for n, e in zip(names, emoji)]
+    print(f"Lines written in order: {lines == expected}")
+
+if __name__ == "__main__":
+    args = sys.argv[1:] or ["?"]
+    handlers = {
+        "ops":    lambda: bench_ops(*map(int, args[1:3])),
+        "stress": lambda: bench_stress(*map(int, args[1:3])),
+        "users":  lambda: bench_users(*map(int, args[1:3])),
+        "storm":  lambda: bench_storm(*map(int, args[1:3])),
+    }
+    handlers.get(args[0], lambda: print(__doc__))()
@@ -0,0 +1,53 @@
+"""
+Buffered writer for group_chat.txt.
+
+Lines are queued in memory and appended in one write per batch – when `max_lines`
+are waiting or `max_delay` seconds after the first queued line, whichever comes
+first – through a single handle kept open. A lock keeps lines in call order, and
+the buffer is flushed at interpreter exit and before fork().
+Processes that leave through os._exit (multiprocessing workers) must flush() first.
+"""
+
+import atexit, os, threading
+
+class ChatWriter:
+    def __init__(self, path, max_lines=256, max_delay=0.2):
+        self.path, self.max_lines, self.max_delay = path, max_lines, max_delay
+        self.buffer, self.file, self.timer = [], None, None
+        self.lock = threading.Lock()
+        atexit.register(self.close)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(before=self.flush, after_in_child=self._after_fork)
+
+    def write(self, line):
+        with self.lock:
+            self.buffer.append(line + "\n")
+            if len(self.buffer) >= self.max_lines:
+                self._flush()
+            elif self.timer is None:
+                self.timer = threading.Timer(self.max_delay, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def _flush(self):
+        if self.timer is not None:
+            self.timer.cancel(); self.timer = None
+        if not self.buffer: return
+        if self.file is None:
+            self.file = open(self.path, "a", encoding="utf-8")
+        self.file.write("".join(self.buffer)); self.file.flush()
+        self.buffer.clear()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            if self.file is not None:
+                self.file.close(); self.file = None
+
+    def _after_fork(self):
+        # The parent flushed before forking; its timer thread does not exist here
+        self.lock, self.timer, self.buffer = threading.Lock(), None, []
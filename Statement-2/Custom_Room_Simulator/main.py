@@ -1,12 +1,12 @@
 import json, secrets, os
 
-STATE, CHAT = "room_state.json", "group_chat.txt"
+STATE, CHAT, LOG = "room_state.json", "group_chat.txt", "room_ops.log"
 hid   = lambda: secrets.token_hex(4)
 save  = lambda s: json.dump(s, open(STATE, "w", encoding="utf-8"), indent=4)
 log   = lambda m: open(CHAT, "a", encoding="utf-8").write(m + "\n")
 
 # fresh session
-for f in (STATE, CHAT):
+for f in (STATE, CHAT, LOG):
     open(f, "w", encoding="utf-8").close()
 
 admin_id = hid()
@@ -24,6 +24,7 @@ state = {
             }
         }
     },
+    "user_index": {"AdminGPU": admin_id},  # username ➜ id
     "playlists": {},                   # id ➜ {name, movies}
     "current_playlist": None,          # playlist id
     "polls": {},
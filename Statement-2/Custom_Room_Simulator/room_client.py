@@ -0,0 +1,61 @@
+"""
+Client for room_server.py.
+
+RoomClient exposes the same functions as user.py (room.chat("User1", "hi"), ...),
+sent to the resident server instead of loading and saving room_state.json.
+connect() returns a RoomClient when a server is running and the user module
+otherwise, so admin.py / userX.py work either way.
+
+Control ops from the shell:
+    python room_client.py ping|flush|shutdown [port]
+"""
+
+import json, socket, sys
+import user
+from room_server import HOST, PORT
+
+class RoomError(Exception):
+    pass
+
+class RoomClient:
+    def __init__(self, host=HOST, port=PORT, connect_timeout=5.0, timeout=None):
+        # connect_timeout only bounds the connection attempt. A reply must not time out
+        # (timeout=None waits for it): the server may still apply a command after the
+        # client gave up, and a retry would then apply it twice
+        self.sock = socket.create_connection((host, port), timeout=connect_timeout)
+        self.sock.settimeout(timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.file = self.sock.makefile("rwb")
+
+    def call(self, op, *args):
+        return self.call_many([(op, args)])[0]
+
+    def call_many(self, calls):
+        """Pipeline several (op, args) calls: one write, then one reply per call."""
+        self.file.write(b"".join(json.dumps({"op": op, "args": list(args)}).encode() + b"\n"
+                                 for op, args in calls))
+        self.file.flush()
+        replies = [json.loads(self.file.readline()) for _ in calls]
+        for reply in replies:
+            if "error" in reply: raise RoomError(reply["error"])
+        return replies
+
+    def __getattr__(self, op):
+        if op not in user.OPERATIONS: raise AttributeError(op)
+        return lambda *args: self.call(op, *args)
+
+    def close(self):
+        self.file.close(); self.sock.close()
+
+def connect(host=HOST, port=PORT):
+    try:
+        return RoomClient(host, port, connect_timeout=0.2)
+    except OSError:
+        return user
+
+if __name__ == "__main__":
+    c = sys.argv[1:] or ["?"]
+    if c[0] not in ("ping", "flush", "shutdown"):
+        sys.exit("Usage: python room_client.py ping|flush|shutdown [port]")
+    RoomClient(port=int(c[1]) if len(c) > 1 else PORT).call(c[0])
+    print(f"{c[0]}: ok")
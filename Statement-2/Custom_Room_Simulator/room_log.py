@@ -0,0 +1,113 @@
+"""
+Append-only operation log for the room (room_ops.log), with room_state.json as its snapshot.
+
+Every user.py command that changes the room appends one JSON line
+    {"seq": 12, "t": 1718000000.0, "op": "vote", "args": ["User1", "a1b2c3d4", "Comedy"], "ids": []}
+("ids" = ids the command generated with hid(), so replay builds the same room) instead
+of rewriting the whole room. room_state.json is rewritten only every COMPACT_EVERY
+entries; it records how far into the log it reaches ("_seq", "_log_offset"), and
+load() replays just the entries after that. The log is never truncated, so it is
+also the room's audit trail:
+
+    python room_log.py [n]       # last n entries (default 20)
+"""
+
+import json, os, secrets, sys, time
+import room_store
+
+LOG = "room_ops.log"
+COMPACT_EVERY = 200
+
+_current  = None      # entry of the command now running
+_replay   = None      # ids to hand out again while replaying an entry
+
+def new_id():
+    if _replay is not None: return _replay.pop(0)
+    h = secrets.token_hex(4)
+    if _current is not None: _current["ids"].append(h)
+    return h
+
+def recorded(op, fn):
+    """Wrap a user.py command so a save() inside it logs op + args."""
+    def run(*args):
+        global _current
+        _current = {"op": op, "args": list(args), "ids": []}
+        try:     return fn(*args)
+        finally: _current = None
+    run.__name__, run.__doc__ = fn.__name__, fn.__doc__
+    return run
+
+def replaying(entry, fn):
+    """Run fn() handing out the ids recorded in entry."""
+    global _replay
+    _replay = list(entry["ids"])
+    try:     return fn()
+    finally: _replay = None
+
+def log_path(state_path):
+    return os.path.join(os.path.dirname(os.path.abspath(state_path)), LOG)
+
+def _read_tail(path, offset):
+    with open(path, "rb") as f:
+        f.seek(offset); return f.read()
+
+def load(state_path, apply):
+    """Snapshot + replay of the log tail; apply(s, entry) re-runs one entry on s."""
+    s = room_store.read(state_path)
+    s.setdefault("_seq", 0); s.setdefault("_log_offset", 0)
+    s["_snapshot_seq"] = s["_seq"]
+    path = log_path(state_path)
+    if not os.path.exists(path) or os.path.getsize(path) <= s["_log_offset"]:
+        return s
+
+    tail = _read_tail(path, s["_log_offset"])
+    complete = tail.rfind(b"\n") + 1
+    if complete < len(tail):
+        # Maybe another process is appending that line right now: look again under the
+        # lock, where an unfinished line can only be left over from a crashed writer
+        with room_store.locked(state_path):
+            tail = _read_tail(path, s["_log_offset"])
+            complete = tail.rfind(b"\n") + 1
+            if complete < len(tail):
+                with open(path, "r+b") as f:
+                    f.truncate(s["_log_offset"] + complete)
+    for line in tail[:complete].splitlines():
+        entry = json.loads(line)
+        apply(s, entry)
+        s["_seq"] = entry["seq"]
+    s["_log_offset"] += complete
+    return s
+
+def save(state_path, s, server=False):
+    """
+    Append the running command's entry; Conflict if another process appended since load().
+    Only the room server (server=True) may write while it runs; it also does its own snapshots.
+    """
+    if _current is None:
+        raise RuntimeError("save() outside a logged user.py command.")
+    path = log_path(state_path)
+    with room_store.locked(state_path):
+        if not server and room_store.server_running(state_path):
+            raise room_store.ServerRunning("A room server owns this room – use room_client / admin.py.")
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size != s["_log_offset"]:
+            raise room_store.Conflict(f"{path} grew since this state was loaded.")
+        line = (json.dumps({"seq": s["_seq"] + 1, "t": round(time.time(), 3), **_current}) + "\n").encode()
+        with open(path, "ab") as f:
+            f.write(line)
+        s["_seq"] += 1; s["_log_offset"] += len(line)
+        if not server and s["_seq"] - s["_snapshot_seq"] >= COMPACT_EVERY:
+            snapshot(state_path, s)
+
+def snapshot(state_path, s):
+    """Compact: write the whole room, marking how far into the log it reaches (caller holds the lock)."""
+    s["_snapshot_seq"] = s["_seq"]
+    room_store.replace(state_path, json.dumps(s, indent=4))
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    if not os.path.exists(LOG): sys.exit("No operation log yet.")
+    for line in open(LOG, encoding="utf-8").readlines()[-n:]:
+        e = json.loads(line)
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(e["t"]))
+        print(f"{e['seq']:6}  {stamp}  {e['op']}({', '.join(map(repr, e['args']))})")
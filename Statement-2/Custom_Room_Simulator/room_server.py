@@ -0,0 +1,138 @@
+"""
+Resident room-state server.
+
+Keeps the room in memory and runs the user.py operations against it, so a command
+costs a dict update plus one operation-log line instead of a JSON parse + rewrite.
+The room_state.json snapshot is written in the background (write-behind) at most
+every `flush_interval` seconds, and once more on shutdown.
+
+Run (after main.py):
+    python room_server.py [port]
+
+Protocol: one JSON object per line over a local TCP socket,
+    {"op": "<user.py function>", "args": [...]}  ->  {"ok": true} | {"error": "..."}
+plus the control ops "ping", "flush" and "shutdown". room_client.py speaks it.
+"""
+
+import asyncio, json, os, sys
+import room_log, room_store, user
+
+HOST, PORT = "127.0.0.1", 8765
+
+class RoomServer:
+    def __init__(self, path=user.STATE, flush_interval=0.5):
+        self.path, self.flush_interval = path, flush_interval
+        # Own the room while running: file-mode user.py refuses to write from now on
+        with room_store.locked(path):             # no file-mode append can be half-way
+            self.server_lock = room_store.hold_server_lock(path)
+        self.state = user.load()                    # snapshot + operation log tail
+        self.dirty = False
+        self.flush_lock = asyncio.Lock()
+        self.stopped = None
+        user.use_state(lambda: self.state, self._record)
+
+    def _record(self, s):
+        # Changes still go to the operation log right away (small append); the
+        # snapshot (room_state.json) is what gets written behind
+        room_log.save(self.path, s, server=True)
+        self.dirty = True
+
+    def _reload(self):
+        """Throw away in-memory changes: rebuild the room from snapshot + operation log."""
+        self.state = room_log.load(self.path, user._replay)
+        self.dirty = True
+
+    def dispatch(self, request, attempts=3):
+        op, args = request.get("op"), request.get("args", [])
+        if op not in user.OPERATIONS:
+            return {"error": f"Unknown op {op!r}."}
+        # Commands change self.state before their save() – if the save or the command
+        # fails, the change never reached the log, so reload rather than keep it
+        for attempt in range(attempts):
+            try:
+                user.LOGGED[op](*args)
+                return {"ok": True}
+            except room_store.Conflict:
+                self._reload()
+            except Exception:
+                self._reload(); raise
+        return {"error": f"{op}: the operation log kept changing under the server."}
+
+    # ── WRITE-BEHIND ──────────────────────────────────────
+    def _write(self, data, offset):
+        """
+        Replace the snapshot if the log still holds everything it covers. Entries the loop
+        appended meanwhile are fine – they follow `offset` and are replayed on load – but a
+        shorter log (a reset room) means data no longer describes this log.
+        """
+        log = room_log.log_path(self.path)
+        # Write and fsync before taking the lock: commands on the loop thread append to
+        # the log under it, so it is held only for the check and the rename
+        tmp = room_store.stage(self.path, data)
+        try:
+            with room_store.locked(self.path):
+                size = os.path.getsize(log) if os.path.exists(log) else 0
+                if size < offset:
+                    raise room_store.Conflict(f"{log} is shorter than the snapshot being written.")
+                os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp); raise
+
+    async def flush(self):
+        async with self.flush_lock:
+            user.chat_log.flush()
+            if not self.dirty: return
+            # Serialise on the loop thread (a consistent snapshot), write off it. Compact:
+            # indent=4 would use json's pure-Python encoder, several times slower
+            data, offset = json.dumps(self.state), self.state["_log_offset"]
+            self.dirty = False
+            try:
+                await asyncio.to_thread(self._write, data, offset)
+            except room_store.Conflict:
+                self._reload()                  # the log was reset under the server: rebuild, write next time
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    # ── CONNECTIONS ───────────────────────────────────────
+    async def _handle(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    op = request.get("op")
+                    if   op == "ping":     reply = {"ok": True}
+                    elif op == "flush":    await self.flush(); reply = {"ok": True}
+                    elif op == "shutdown": self.stopped.set(); reply = {"ok": True}
+                    else:                  reply = self.dispatch(request)
+                except Exception as e:     # a bad command must not take the room down
+                    reply = {"error": f"{type(e).__name__}: {e}"}
+                writer.write((json.dumps(reply) + "\n").encode())
+                await writer.drain()
+        except (asyncio.CancelledError, ConnectionError):
+            pass                           # server stopping / client gone
+        finally:
+            writer.close()
+
+    async def serve(self, host=HOST, port=PORT, ready=None):
+        self.stopped = asyncio.Event()
+        server = await asyncio.start_server(self._handle, host, port)
+        flusher = asyncio.create_task(self._flush_periodically())
+        if ready: ready()
+        try:
+            async with server:
+                await self.stopped.wait()
+        finally:                          # also on Ctrl+C: nothing acknowledged is lost
+            flusher.cancel()
+            await self.flush()
+            self.server_lock.close()
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else PORT
+    print(f"Room server on {HOST}:{port} – Ctrl+C or 'python room_client.py shutdown' to stop.")
+    try:
+        asyncio.run(RoomServer().serve(HOST, port))
+    except KeyboardInterrupt:
+        pass
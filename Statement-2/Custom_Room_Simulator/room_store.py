@@ -0,0 +1,103 @@
+"""
+Safe persistence for room_state.json when several admin.py / userX.py processes run at once.
+
+- Writes go to a temp file in the same folder and are renamed over the state
+  (os.replace), so a reader never sees a half-written file.
+- Writers take an exclusive lock on "<state>.lock" (fcntl, msvcrt on Windows).
+- Changes are appended to room_ops.log (room_log.py) under that lock. A state
+  remembers the log size it was loaded at ("_log_offset"); if the log has grown
+  since, the append fails with Conflict (a lost update) and retrying() re-runs the
+  whole command on the fresh state.
+- A running room_server.py also holds "<state>.server"; while it does, file-mode
+  writes fail with ServerRunning.
+"""
+
+import json, os, random, tempfile, time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+    def _lock(f):   fcntl.flock(f, fcntl.LOCK_EX)
+    def _unlock(f): fcntl.flock(f, fcntl.LOCK_UN)
+    def _try_lock(f):
+        try:    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB); return True
+        except BlockingIOError: return False
+except ImportError:                                   # Windows
+    import msvcrt
+    def _lock(f):
+        while True:
+            try: return msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            except OSError: pass                      # LK_LOCK gives up after ~10s
+    def _unlock(f): msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    def _try_lock(f):
+        try:    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1); return True
+        except OSError: return False
+
+class Conflict(Exception):
+    """The state file changed after this state was loaded."""
+
+class ServerRunning(Exception):
+    """A room server owns this room; send commands through room_client instead."""
+
+def hold_server_lock(path):
+    """Mark the room as served by this process until it exits; returns the open lock file."""
+    f = open(path + ".server", "a+b")
+    if not _try_lock(f):
+        f.close(); raise ServerRunning(f"Another room server already serves {path}.")
+    return f
+
+def server_running(path):
+    if not os.path.exists(path + ".server"): return False
+    with open(path + ".server", "a+b") as f:
+        if not _try_lock(f): return True
+        _unlock(f); return False
+
+@contextmanager
+def locked(path):
+    with open(path + ".lock", "a+b") as f:
+        _lock(f)
+        try:     yield
+        finally: _unlock(f)
+
+def read(path):
+    for attempt in range(50):
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except PermissionError:                       # Windows: mid-rename by a writer
+            time.sleep(0.01)
+    raise PermissionError(f"Cannot read {path}.")
+
+def stage(path, data):
+    """Write data to a synced temp file next to path (no lock needed); returns its name for os.replace."""
+    fd, tmp = tempfile.mkstemp(prefix=".room-", suffix=".json", dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(data); f.flush(); os.fsync(f.fileno())
+    except BaseException:
+        os.unlink(tmp); raise
+    return tmp
+
+def replace(path, data):
+    """Atomically replace the file at path with the text data."""
+    tmp = stage(path, data)
+    try:
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp); raise
+
+conflicts = 0                                         # retries so far in this process
+
+def retrying(fn, attempts=100):
+    """Re-run a load → modify → save command until its save wins."""
+    def run(*args, **kw):
+        global conflicts
+        for attempt in range(attempts):
+            try:
+                return fn(*args, **kw)
+            except Conflict:
+                conflicts += 1
+                time.sleep(random.uniform(0, 0.002 * min(attempt + 1, 10)))
+        raise Conflict(f"{fn.__name__}: gave up after {attempts} conflicting attempts.")
+    run.__name__, run.__doc__ = fn.__name__, fn.__doc__
+    return run
@@ -1,19 +1,34 @@
-import json, secrets
+import room_log, room_store
+from chat_writer import ChatWriter
 
 STATE, CHAT = "room_state.json", "group_chat.txt"
-hid  = lambda: secrets.token_hex(4)
+hid  = lambda: room_log.new_id()
 
-load = lambda: json.load(open(STATE, encoding="utf-8"))
-save = lambda s: json.dump(s, open(STATE, "w", encoding="utf-8"), indent=4)
-_APP = lambda ln: open(CHAT, "a", encoding="utf-8").write(ln + "\n")
+# Snapshot + operation log (see room_log): save() appends one entry for the running
+# command under a lock, and commands retry when another process appended first
+load = lambda: room_log.load(STATE, _replay)
+save = lambda s: room_log.save(STATE, s)
+chat_log = ChatWriter(CHAT)       # batched appends, flushed at exit
+_APP = chat_log.write
 
 def log_status(msg):  _APP(msg)
 def log_chat(u,t):    _APP(f"[chat] {u}: {t}")
 def log_react(u,e):   _APP(f"[reaction] {u}: {e}")
 
+def use_state(get, put):
+    """Route every load()/save() below through another backend, e.g. room_server's memory."""
+    global load, save
+    load, save = get, put
+
 EMOJI = {"1":"😂","2":"👍","3":"❤️","4":"👏"}
 
-uid = lambda n,s: next((k for k,v in s["users"].items() if v["username"]==n), None)
+def user_index(s):
+    """username ➜ user id, kept in the state next to "users" (built once for older rooms)."""
+    if "user_index" not in s:
+        s["user_index"] = {v["username"]: k for k,v in s["users"].items()}
+    return s["user_index"]
+
+uid = lambda n,s: user_index(s).get(n)
 adm = lambda u,s: s["users"][u]["roles"]["is_admin"]
 co  = lambda u,s: s["users"][u]["roles"]["is_co_admin"]
 mod = lambda u,s: adm(u,s) or co(u,s)
@@ -119,10 +134,12 @@ def add_user(admin,new_name):
     s=load(); aid=uid(admin,s)
     if not adm(aid,s): return log_status("Permission denied.")
     if uid(new_name,s): return log_status(f"User '{new_name}' already exists.")
-    s["users"][hid()]={"username":new_name,"roles":{"is_admin":False,"is_co_admin":False},
-                       "personal":{"video_on":True,"audio_on":True,
-                                   "reactions_on":True,"screen_lock":False,
-                                   "raised_hand":False}}
+    nid=hid()
+    s["users"][nid]={"username":new_name,"roles":{"is_admin":False,"is_co_admin":False},
+                     "personal":{"video_on":True,"audio_on":True,
+                                 "reactions_on":True,"screen_lock":False,
+                                 "raised_hand":False}}
+    user_index(s)[new_name]=nid
     save(s); log_status(f"{new_name} joined the room.")
 
 def promote(admin,target,make=True):
@@ -135,7 +152,7 @@ def kick(actor,target):
     s=load(); aid=uid(actor,s); tid=uid(target,s)
     if not aid or not tid: return log_status("Kick failed.")
     if not _kick_allowed(aid,tid,s): return log_status("Kick denied – insufficient rights.")
-    del s["users"][tid]; save(s); log_status(f"{target} left the room.")
+    del s["users"][tid]; del user_index(s)[target]; save(s); log_status(f"{target} left the room.")
 
 # ── COMMUNICATION & PERSONAL CONTROLS ─────────────────
 def chat(name,text):
@@ -201,3 +218,25 @@ def share(actor,allow):
     if not adm(aid,s): return log_status("Denied.")
     s["screen_sharing_allowed"]=allow; save(s)
     log_status(f"Screen-sharing {'ENABLED' if allow else 'DISABLED'} by admin.")
+
+# Operations a room client may call (room_server.py dispatches on these names)
+OPERATIONS = ("playlist_create","playlist_add","playlist_remove","playlist_show","playlist_switch",
+              "current_playlist_add","current_playlist_remove","current_playlist_show","current_playlist_next",
+              "add_user","promote","kick","chat","react","toggle_self","hand",
+              "poll_create","vote","poll_end","glob_toggle","force_personal","share")
+
+_RAW = {op: globals()[op] for op in OPERATIONS}
+
+def _replay(s, entry):
+    """Re-run a logged command on s – silently, with the ids it generated."""
+    global load, save, _APP
+    outer = load, save, _APP
+    load, save, _APP = (lambda: s), (lambda _: None), (lambda ln: None)
+    try:     room_log.replaying(entry, lambda: _RAW[entry["op"]](*entry["args"]))
+    finally: load, save, _APP = outer
+
+# Log what each command changes (LOGGED, used as-is by room_server); in file mode
+# re-run a command from load() when another process saved in between
+LOGGED = {op: room_log.recorded(op, _RAW[op]) for op in OPERATIONS}
+for _op in OPERATIONS:
+    globals()[_op] = room_store.retrying(LOGGED[_op])
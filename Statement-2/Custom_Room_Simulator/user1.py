@@ -1,4 +1,5 @@
-import sys, user
+import sys, room_client
+user = room_client.connect()             # resident room server if running, else user.py
 ME="User1"                                # change per copy
 
 a = sys.argv[1:] or ["?"]
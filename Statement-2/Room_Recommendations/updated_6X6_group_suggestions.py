@@ -19,11 +19,19 @@ Real-World Integration:
 - Could leverage AWS Kinesis for data streaming and processing
 """
 
+import os
+import sys
 import numpy as np
-import random
 from enum import Enum
 from dataclasses import dataclass
-from typing import List, Dict, Tuple
+from typing import List, Dict, Sequence, Tuple
+
+# The catalog file format and top-k selection are shared with the personal recommender,
+# so both engines read the same catalog files
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "..", "..", "Statement-1", "Personalised_AI_Recommendations"))
+from catalog_file import CatalogFile, write_catalog
+from Personalised_recommendations import top_k_indices
 
 # --- Enumerations for Modalities and Attributes ---
 class TimeBlock(Enum):
@@ -77,6 +85,31 @@ class GroupRecommendation:
     explanation: str
     movie_matrix: np.ndarray
 
+class FileMovies(Sequence):
+    """Movies of a memory-mapped catalog file, materialized as Movie objects only when accessed"""
+    def __init__(self, source: CatalogFile):
+        self.source = source
+    
+    def __len__(self) -> int:
+        return len(self.source)
+    
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("catalog row out of range")
+        
+        source = self.source
+        matrix = source.compatibility[row].astype(np.float64) * source.scale
+        compatibility = {
+            emotion.value: {modality.value: round(float(matrix[e, m]), 6) for m, modality in enumerate(AnalysisType)}
+            for e, emotion in enumerate(Emotion)
+        }
+        return Movie(source.title_at(row), int(source.years[row]), source.genres[source.genre_codes[row]],
+                     compatibility, float(source.popularity[row]), float(source.suitability[row]))
+
 # --- Sample Movie Database ---
 MOVIES = [
     Movie("Avengers: Endgame", 2019, "Action/Adventure",
@@ -125,41 +158,88 @@ MOVIES = [
           8.6, 7.0)
 ]
 
+# Base emotion profile (rows follow Emotion, columns follow AnalysisType) for simulated groups
+GROUP_BASE_PROFILE = np.array([
+    [0.3, 0.2, 0.4, 0.5, 0.3, 0.4],  # angry
+    [0.1, 0.1, 0.2, 0.3, 0.2, 0.2],  # disgust
+    [0.4, 0.3, 0.5, 0.6, 0.4, 0.5],  # fear
+    [0.8, 0.9, 0.7, 0.8, 0.9, 0.8],  # happy
+    [0.6, 0.7, 0.6, 0.5, 0.7, 0.6],  # neutral
+    [0.2, 0.3, 0.2, 0.1, 0.3, 0.2]   # sad
+])
+
 # --- Recommendation Engine ---
 class GroupRecommender:
     def __init__(self, movies: List[Movie]):
         self.movies = movies
         self.modality_weights = np.array([0.15, 0.15, 0.25, 0.20, 0.15, 0.10])
         
-    def generate_group_matrix(self, group_size: int = 10) -> np.ndarray:
-        """Generate a realistic 6×6 group preference matrix"""
+        if isinstance(movies, FileMovies):
+            # Memory-mapped catalog: score straight from the file's compatibility blocks
+            source = movies.source
+            self.catalog_matrices = source.compatibility if source.scale == 1.0 else source.compatibility * source.scale
+            self.popularity_factors = source.popularity / 10.0
+            self.suitability_factors = source.suitability / 10.0
+            return
+        
+        # Catalog compiled once into an N×6×6 (emotion × modality) array for flat scoring
+        self.catalog_matrices = self.build_catalog_tensor(movies)
+        self.popularity_factors = np.array([m.popularity_score for m in movies]) / 10.0
+        self.suitability_factors = np.array([m.group_suitability for m in movies]) / 10.0
+    
+    @classmethod
+    def from_catalog_file(cls, path: str) -> "GroupRecommender":
+        """Create a recommender over a memory-mapped catalog file"""
+        source = CatalogFile(path)
+        if source.shape != (6, 6):
+            raise ValueError(f"{path} holds {source.shape} blocks, expected 6×6")
+        return cls(FileMovies(source))
+    
+    def save_catalog_file(self, path: str):
+        """Write the catalog as a memory-mappable catalog file (atomic replace)"""
+        genres = sorted({movie.genre for movie in self.movies})
+        genre_codes = {genre: code for code, genre in enumerate(genres)}
+        write_catalog(path,
+                      [movie.title for movie in self.movies],
+                      np.array([movie.year for movie in self.movies]),
+                      np.array([genre_codes[movie.genre] for movie in self.movies]),
+                      genres,
+                      self.catalog_matrices,
+                      np.array([movie.popularity_score for movie in self.movies]),
+                      np.array([movie.group_suitability for movie in self.movies]))
+    
+    def build_movie_matrix(self, movie: Movie) -> np.ndarray:
+        """Flatten a movie's nested emotion compatibility into a 6×6 matrix (missing entries are 0)"""
         matrix = np.zeros((6, 6))
+        for emotion_idx, emotion in enumerate(Emotion):
+            modalities = movie.emotion_compatibility.get(emotion.value, {})
+            for modality_idx, modality in enumerate(AnalysisType):
+                matrix[emotion_idx, modality_idx] = modalities.get(modality.value, 0.0)
+        return matrix
+    
+    def build_catalog_tensor(self, movies: List[Movie]) -> np.ndarray:
+        """Stack every movie matrix into one N×6×6 tensor"""
+        if not movies:
+            return np.zeros((0, 6, 6))
+        return np.stack([self.build_movie_matrix(movie) for movie in movies])
+    
+    def generate_group_matrix(self, group_size: int = 10, rng=None) -> np.ndarray:
+        """Generate a realistic 6×6 group preference matrix (rng: seed or numpy Generator)"""
+        return self.generate_group_matrices(1, group_size, rng)[0]
+    
+    def generate_group_matrices(self, count: int, group_size: int = 10, rng=None) -> np.ndarray:
+        """Generate count group matrices at once; rng=None keeps the legacy global np.random state"""
+        rng = np.random if rng is None else np.random.default_rng(rng)
         
-        # Create base profile with realistic distributions
-        base_profile = {
-            "angry": [0.3, 0.2, 0.4, 0.5, 0.3, 0.4],
-            "disgust": [0.1, 0.1, 0.2, 0.3, 0.2, 0.2],
-            "fear": [0.4, 0.3, 0.5, 0.6, 0.4, 0.5],
-            "happy": [0.8, 0.9, 0.7, 0.8, 0.9, 0.8],
-            "neutral": [0.6, 0.7, 0.6, 0.5, 0.7, 0.6],
-            "sad": [0.2, 0.3, 0.2, 0.1, 0.3, 0.2]
-        }
+        # Each member varies the base profile by ±20% per emotion and modality
+        variations = rng.uniform(0.8, 1.2, size=(count, 6, 6, group_size))
+        values = GROUP_BASE_PROFILE[np.newaxis, :, :, np.newaxis] * variations
         
-        # Apply group variations
-        for emotion_idx, emotion in enumerate(Emotion):
-            for modality_idx in range(6):
-                values = []
-                for _ in range(group_size):
-                    variation = np.random.uniform(0.8, 1.2)
-                    values.append(base_profile[emotion.value][modality_idx] * variation)
-                
-                # Use robust aggregation (70% median, 30% mean)
-                median_val = np.median(values)
-                mean_val = np.mean(values)
-                matrix[emotion_idx, modality_idx] = 0.7 * median_val + 0.3 * mean_val
+        # Use robust aggregation (70% median, 30% mean)
+        matrices = 0.7 * np.median(values, axis=-1) + 0.3 * np.mean(values, axis=-1)
         
         # Normalize to [0,1] range
-        return np.clip(matrix, 0, 1)
+        return np.clip(matrices, 0, 1)
     
     def calculate_match_matrix(self, group_matrix: np.ndarray, movie: Movie) -> np.ndarray:
         """Compute movie-specific match matrix through element-wise multiplication"""
@@ -196,6 +276,19 @@ class GroupRecommender:
         # Final consensus score (60% match, 20% popularity, 20% suitability)
         return 0.6 * raw_score + 0.2 * pop_factor + 0.2 * suit_factor
     
+    def score_catalog(self, group_matrix: np.ndarray) -> np.ndarray:
+        """Consensus scores for the whole catalog as a flat array, matching calculate_consensus_score"""
+        match = group_matrix[np.newaxis] * self.catalog_matrices
+        
+        # Per-movie max normalization applied to the diagonal only
+        max_vals = match.max(axis=(1, 2), initial=0.0)
+        diagonals = np.diagonal(match, axis1=1, axis2=2)
+        diagonals = np.divide(diagonals, max_vals[:, np.newaxis],
+                              out=diagonals.copy(), where=max_vals[:, np.newaxis] > 0)
+        
+        raw_scores = diagonals @ self.modality_weights
+        return 0.6 * raw_scores + 0.2 * self.popularity_factors + 0.2 * self.suitability_factors
+    
     def calculate_group_metrics(self, scores: List[float]) -> Tuple[float, float]:
         """Calculate standard deviation and selectability"""
         std_dev = float(np.std(scores))
@@ -213,16 +306,16 @@ class GroupRecommender:
         else:
             return "Mixed group sentiment with unique alignment."
     
-    def generate_recommendations(self, group_matrix: np.ndarray) -> List[GroupRecommendation]:
-        """Generate top 5 group recommendations"""
+    def generate_recommendations(self, group_matrix: np.ndarray, k: int = 5) -> List[GroupRecommendation]:
+        """Generate top k group recommendations"""
+        consensus_scores = self.score_catalog(group_matrix)
         recommendations = []
-        all_scores = []
         
-        for movie in self.movies:
-            # Compute match matrix and consensus score
+        # Match matrices and explanations are only built for the winners
+        for idx in top_k_indices(consensus_scores, k):
+            movie = self.movies[idx]
+            consensus_score = float(consensus_scores[idx])
             match_matrix = self.calculate_match_matrix(group_matrix, movie)
-            consensus_score = self.calculate_consensus_score(match_matrix, movie)
-            all_scores.append(consensus_score)
             
             # Generate explanation
             std_dev, selectability = self.calculate_group_metrics([consensus_score])
@@ -237,9 +330,7 @@ class GroupRecommender:
                 movie_matrix=match_matrix
             ))
         
-        # Sort by consensus score and return top 5
-        recommendations.sort(key=lambda x: x.consensus_score, reverse=True)
-        return recommendations[:5]
+        return recommendations
     
     def display_recommendations(self, recommendations: List[GroupRecommendation], group_matrix: np.ndarray):
         """Display recommendations in the specified format"""
@@ -287,7 +378,7 @@ class GroupRecommender:
             print(f"   {list(AnalysisType)[i].value[:6]:<8} " + " ".join(f"{val:.3f}".ljust(8) for val in row))
 '''
 # --- Main Execution ---
-def main():
+def main(seed: int = 42):
     print("=" * 80)
     print("FIRE TV GROUP RECOMMENDATION SYSTEM - 6×6 MATRIX ANALYSIS")
     print("=" * 80)
@@ -295,7 +386,7 @@ def main():
     
     # Initialize recommender and generate group matrix
     recommender = GroupRecommender(MOVIES)
-    group_matrix = recommender.generate_group_matrix()
+    group_matrix = recommender.generate_group_matrix(rng=np.random.default_rng(seed))
     
     # Generate recommendations
     recommendations = recommender.generate_recommendations(group_matrix)
@@ -308,7 +399,4 @@ def main():
     
 
 if __name__ == "__main__":
-    # Set random seed for reproducible results
-    np.random.seed(42)
-    random.seed(42)
     main()
\ No newline at end of file